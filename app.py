@@ -1,19 +1,246 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, request, jsonify, render_template, send_from_directory, Response, stream_with_context
 import os
-import requests
+import json
 import time
+import threading
+import queue
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import random
 import re
-from typing import List, Dict, Any, Union, Optional
+from typing import List, Dict, Any, Optional, Iterator, Callable, Tuple
 from dotenv import load_dotenv
+from contextlib import closing
+from ollama_client import OllamaTimeoutError
+from ollama_pool import OllamaPool, parse_urls
+from question_cache import QuestionCache, MemoryCache, SQLiteCache, cache_key
+from single_flight import SingleFlight, SharedCallError
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from model_warmer import ModelWarmer
+from text_chunks import split_into_chunks, allocate_counts, estimate_tokens, CHARS_PER_TOKEN
+from prompt_budget import plan_budget, fit_to_budget, messages_tokens
+from jobs import JobManager, QueueFullError
+from metrics import Registry
+from tracing import Tracer, current_span, new_trace_id
+from question_parser import QuestionStreamParser, parse_blocks, split_qa_pairs, split_options
+from question_schema import JsonQuestionStreamParser, questions_schema
+from documents import DocumentStore, DocumentError
+from notes_index import NotesIndex, NotesIndexCache, Sentence, extract_keywords2
 
 load_dotenv()
 #default localhost port 11434
-OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
+OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")  #several, comma-separated, to spread the load
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+#close the ollama stream as soon as enough questions have been parsed
+OLLAMA_EARLY_STOP = os.getenv("OLLAMA_EARLY_STOP", "true").lower() == "true"
+#connection pool / timeouts shared by every call to ollama
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", 4))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", 90))
+OLLAMA_DEADLINE = float(os.getenv("OLLAMA_DEADLINE", 90))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", 30))
+#longest a request waits on an identical one already generating before it falls back (a deadline per attempt)
+SHARED_WAIT_TIMEOUT = float(os.getenv("SHARED_WAIT_TIMEOUT", OLLAMA_DEADLINE * 3))
+#with several backends: how often each is checked, and how many failed calls in a row take one out of rotation
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", 10))
+OLLAMA_UNHEALTHY_AFTER = int(os.getenv("OLLAMA_UNHEALTHY_AFTER", 3))
+
+#circuit breaker: stop calling ollama for a while when recent calls keep failing or are too slow
+OLLAMA_BREAKER_WINDOW = int(os.getenv("OLLAMA_BREAKER_WINDOW", 20))
+OLLAMA_BREAKER_WINDOW_SECONDS = float(os.getenv("OLLAMA_BREAKER_WINDOW_SECONDS", 60))
+OLLAMA_BREAKER_MIN_CALLS = int(os.getenv("OLLAMA_BREAKER_MIN_CALLS", 5))
+OLLAMA_BREAKER_FAILURE_RATE = float(os.getenv("OLLAMA_BREAKER_FAILURE_RATE", 0.5))
+OLLAMA_BREAKER_SLOW_SECONDS = float(os.getenv("OLLAMA_BREAKER_SLOW_SECONDS", 20))  #time to first token
+OLLAMA_BREAKER_OPEN_SECONDS = float(os.getenv("OLLAMA_BREAKER_OPEN_SECONDS", 30))
+#cache of generated question sets, keyed by the notes + settings that produced them
+QUESTION_CACHE_ENABLED = os.getenv("QUESTION_CACHE_ENABLED", "true").lower() == "true"
+QUESTION_CACHE_TTL = float(os.getenv("QUESTION_CACHE_TTL", 24 * 3600))
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", 256))
+QUESTION_CACHE_MAX_BYTES = int(os.getenv("QUESTION_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+QUESTION_CACHE_DB = os.getenv("QUESTION_CACHE_DB", "")  #e.g. question_cache.sqlite3, empty = memory only
+
+#long notes are split into chunks that each get their own prompt instead of being cut off
+CHUNKED_GENERATION = os.getenv("CHUNKED_GENERATION", "true").lower() == "true"
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 1024))  #~4000 chars; the prompt budget still trims a chunk that doesn't fit
+CHUNK_MAX_PARALLEL = int(os.getenv("CHUNK_MAX_PARALLEL", 4))
+#random mode as one request per question type, run at once, instead of one request for a mix
+RANDOM_FANOUT = os.getenv("RANDOM_FANOUT", "true").lower() == "true"
+
+#background generation jobs (POST /api/jobs, then poll)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", 32))
+JOB_TTL = float(os.getenv("JOB_TTL", 600))
+
+#batch generation (/api/generate-questions/batch), shared by every batch request
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 500))
+
+#uploaded documents: stored and extracted server-side, referenced by documentId
+#defaults to uploads/ next to this file, not the working directory, so imports from elsewhere don't scatter them
+DOCUMENT_DIR = os.getenv("DOCUMENT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"))
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", os.cpu_count() or 2))
+DOCUMENT_PAGES_PER_TASK = int(os.getenv("DOCUMENT_PAGES_PER_TASK", 16))
+DOCUMENT_MAX_BYTES = int(os.getenv("DOCUMENT_MAX_BYTES", 50 * 1024 * 1024))
+
+#analysed notes kept for the local generators, keyed by content hash
+NOTES_INDEX_CACHE_SIZE = int(os.getenv("NOTES_INDEX_CACHE_SIZE", 16))
+
+#request tracing, viewable at /api/traces
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 2000))  #finished spans kept in memory
+TRACE_FILE = os.getenv("TRACE_FILE", "")  #e.g. traces.jsonl, empty = memory only
+TRACE_EVENT_SAMPLE_RATE = float(os.getenv("TRACE_EVENT_SAMPLE_RATE", 0.1))  #share of traces that keep raw model output
+TRACE_EVENT_MAX_CHARS = int(os.getenv("TRACE_EVENT_MAX_CHARS", 4000))
+
+#context window shared by the prompt and the answer; notes fill whatever the instructions and answer leave
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", 4096))
+OLLAMA_OUTPUT_MARGIN = float(os.getenv("OLLAMA_OUTPUT_MARGIN", 1.5))  #num_predict = expected answer size * this
+#how long ollama keeps the model (and its cached prompt prefix) loaded after a request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+#json: ollama constrains the answer to a JSON schema (ollama 0.5+); text: the ===-separated layout read by the regex parsers
+OLLAMA_FORMAT = os.getenv("OLLAMA_FORMAT", "text").lower()
+
+#a short answer is topped up by asking ollama for just the missing questions, if the request is still within this budget
+GENERATION_LATENCY_BUDGET = float(os.getenv("GENERATION_LATENCY_BUDGET", 60))
+TOP_UP_MIN_SECONDS = float(os.getenv("TOP_UP_MIN_SECONDS", 5))  #less time left than this: pad with local questions
+
+#load the model at startup and ping it during busy hours so it's never cold for the first user
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+MODEL_PING_INTERVAL = float(os.getenv("MODEL_PING_INTERVAL", 300))  #keep below OLLAMA_KEEP_ALIVE
+MODEL_BUSY_HOURS = os.getenv("MODEL_BUSY_HOURS", "")  #e.g. 7-23 (local time), empty = all day
+MODEL_WARMUP_TIMEOUT = float(os.getenv("MODEL_WARMUP_TIMEOUT", 300))  #loading a big model can take minutes
+
+#sampling options for the main generation prompt (also part of the cache key);
+#num_predict is set per request from the prompt budget
+GENERATION_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "num_ctx": OLLAMA_NUM_CTX
+}
 
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
+#refuse oversized bodies before werkzeug spools them to disk; the headroom covers the multipart framing
+app.config['MAX_CONTENT_LENGTH'] = DOCUMENT_MAX_BYTES + 1024 * 1024
+
+#one client per backend (OLLAMA_MAX_CONCURRENCY each), each call routed to the least loaded
+ollama_client = OllamaPool(
+    parse_urls(OLLAMA_API_URL),
+    health_interval=OLLAMA_HEALTH_INTERVAL,
+    unhealthy_after=OLLAMA_UNHEALTHY_AFTER,
+    max_concurrency=OLLAMA_MAX_CONCURRENCY,
+    connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+    read_timeout=OLLAMA_READ_TIMEOUT,
+    deadline=OLLAMA_DEADLINE,
+    queue_timeout=OLLAMA_QUEUE_TIMEOUT
+)
+
+#every backend has to have the model loaded, so each gets its own warmer
+model_warmers = {
+    backend.url: ModelWarmer(
+        backend.client,
+        OLLAMA_MODEL,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        interval=MODEL_PING_INTERVAL,
+        busy_hours=MODEL_BUSY_HOURS,
+        warmup_timeout=MODEL_WARMUP_TIMEOUT
+    )
+    for backend in ollama_client.backends
+}
+
+ollama_breaker = CircuitBreaker(
+    window=OLLAMA_BREAKER_WINDOW,
+    window_seconds=OLLAMA_BREAKER_WINDOW_SECONDS,
+    min_calls=OLLAMA_BREAKER_MIN_CALLS,
+    failure_rate=OLLAMA_BREAKER_FAILURE_RATE,
+    slow_call_seconds=OLLAMA_BREAKER_SLOW_SECONDS,
+    open_seconds=OLLAMA_BREAKER_OPEN_SECONDS
+)
+
+question_cache = QuestionCache(
+    MemoryCache(QUESTION_CACHE_MAX_ENTRIES, QUESTION_CACHE_MAX_BYTES, QUESTION_CACHE_TTL),
+    SQLiteCache(QUESTION_CACHE_DB, ttl=QUESTION_CACHE_TTL) if QUESTION_CACHE_DB else None
+)
+
+notes_indexes = NotesIndexCache(NOTES_INDEX_CACHE_SIZE)
+
+tracer = Tracer(
+    enabled=TRACE_ENABLED,
+    buffer_size=TRACE_BUFFER_SIZE,
+    path=TRACE_FILE,
+    event_sample_rate=TRACE_EVENT_SAMPLE_RATE,
+    max_event_chars=TRACE_EVENT_MAX_CHARS
+)
+
+document_store = DocumentStore(
+    DOCUMENT_DIR,
+    max_workers=DOCUMENT_WORKERS,
+    pages_per_task=DOCUMENT_PAGES_PER_TASK,
+    max_bytes=DOCUMENT_MAX_BYTES
+)
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+#identical generation requests in flight at the same time share one ollama call
+generation_flight = SingleFlight()
+
+early_stop_lock = threading.Lock()
+early_stop_stats = {"requests": 0, "tokens_generated": 0, "tokens_saved": 0}
+
+PRACTICE_MODES = {'multiple-choice', 'true-false', 'fill-blank', 'short-answer', 'random'}
+DIFFICULTY_LEVELS = {'beginner', 'intermediate', 'expert'}
+
+#prometheus metrics served at /metrics
+metrics = Registry()
+request_seconds = metrics.histogram(
+    "studybuddy_request_seconds", "End-to-end time of a question generation request",
+    ["endpoint", "mode", "difficulty", "source"]
+)
+stage_seconds = metrics.histogram(
+    "studybuddy_stage_seconds", "Time spent in each stage: prompt, ollama (waiting on the model), parse, fallback, local",
+    ["stage", "mode", "difficulty"]
+)
+ollama_retries = metrics.counter("studybuddy_ollama_retries_total", "Ollama generations retried after a failure", ["mode", "difficulty"])
+ollama_timeouts = metrics.counter("studybuddy_ollama_timeouts_total", "Ollama calls that timed out", ["mode", "difficulty"])
+parse_shortfall = metrics.counter(
+    "studybuddy_parse_shortfall_questions_total", "Questions asked of Ollama but missing from what was parsed",
+    ["mode", "difficulty"]
+)
+top_up_questions_total = metrics.counter(
+    "studybuddy_top_up_questions_total", "Questions missing from a short Ollama answer, by where the replacements came from",
+    ["source", "mode", "difficulty"]
+)
+fallback_questions = metrics.counter(
+    "studybuddy_fallback_questions_total", "Questions made locally: top_up pads a short Ollama answer, local replaces it",
+    ["kind", "mode", "difficulty"]
+)
+ollama_eval_tokens = metrics.histogram(
+    "studybuddy_ollama_eval_tokens", "Tokens Ollama generated per call (eval_count)", ["mode", "difficulty"],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+)
+ollama_eval_seconds = metrics.histogram(
+    "studybuddy_ollama_eval_seconds", "Ollama's own decode time per call (eval_duration)", ["mode", "difficulty"]
+)
+parsed_questions = metrics.counter(
+    "studybuddy_parsed_questions_total",
+    "Questions parsed from Ollama's output, by requested format and the parser that read them (text after invalid JSON)",
+    ["format", "parser", "mode", "difficulty"]
+)
+model_resident = metrics.gauge(
+    "studybuddy_model_resident", "1 if the Ollama backend had the model loaded at the last check, 0 if not", ["model", "backend"]
+)
+ollama_prompt_eval_seconds = metrics.histogram(
+    "studybuddy_ollama_prompt_eval_seconds", "Ollama's own prompt processing time per call (prompt_eval_duration)",
+    ["mode", "difficulty"]
+)
+
+
+def metric_labels(practice_mode: str, difficulty: str) -> Dict[str, str]:
+    """mode and difficulty labels, with values clients made up folded into "other" so the series stay bounded."""
+    return {
+        "mode": practice_mode if practice_mode in PRACTICE_MODES else 'other',
+        "difficulty": difficulty if difficulty in DIFFICULTY_LEVELS else 'other',
+    }
 
 
 def clean_notes(text):
@@ -48,18 +275,12 @@ def test_ollama():
 Generate 1 multiple-choice question (with A–D) about photosynthesis:
 Photosynthesis converts light into chemical energy in plants."""
         
-        response = requests.post(
-            f"{OLLAMA_API_URL}/api/generate",
-            json={
+        with tracer.span('test_ollama', prompt_length=len(prompt)) as span:
+            data = ollama_client.generate({
                 "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False
-            }
-        )
-        
-        print("STATUS", response.status_code)  
-        data = response.json()
-        print("RAW Ollama response:", data)
+                "prompt": prompt
+            })
+            span.event('model_output', text=data.get("response", ""))
         
         return jsonify(data)
     except Exception as e:
@@ -67,127 +288,604 @@ Photosynthesis converts light into chemical energy in plants."""
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss/eviction counters for the question set cache, plus the notes index and document caches."""
+    return jsonify({
+        "enabled": QUESTION_CACHE_ENABLED,
+        **question_cache.stats(),
+        "notes_index": notes_indexes.stats(),
+        "documents": document_store.stats()
+    })
+
+
+@app.route('/api/traces', methods=['GET'])
+def list_traces():
+    """The most recent traces, newest first (?limit=N)."""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({"traces": tracer.traces(limit), "tracer": tracer.stats()})
+
+
+@app.route('/api/traces/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    """Every span of one trace; ids come from /api/traces or a response's X-Trace-Id header."""
+    spans = tracer.trace(trace_id)
+    if not spans:
+        return jsonify({"error": "Unknown trace, or it has left the buffer"}), 404
+    return jsonify({"trace_id": trace_id, "spans": spans})
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latency histograms and retry/timeout/fallback counters in the Prometheus text format."""
+    for url, warmer in model_warmers.items():
+        resident = warmer.status()["resident"]
+        if resident is not None:
+            model_resident.set(int(resident), model=OLLAMA_MODEL, backend=url)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/model-status', methods=['GET'])
+def model_status():
+    """Whether the model is loaded in Ollama, plus the warm-up schedule (?check=true asks Ollama now)."""
+    if request.args.get('check') == 'true':
+        for warmer in model_warmers.values():
+            warmer.check()
+    return jsonify(model_status_report())
+
+
+def model_status_report() -> Dict[str, Any]:
+    """The warmer's status; with several backends, one per backend and whether all have the model."""
+    statuses = {url: warmer.status() for url, warmer in model_warmers.items()}
+    if len(statuses) == 1:
+        return next(iter(statuses.values()))
+    resident = [status["resident"] for status in statuses.values()]
+    return {
+        "model": OLLAMA_MODEL,
+        "resident": None if None in resident else all(resident),
+        "backends": statuses,
+    }
+
+
+@app.route('/api/ollama-stats', methods=['GET'])
+def ollama_stats():
+    """Connection pool / concurrency / circuit breaker stats for the shared Ollama client."""
+    with early_stop_lock:
+        early_stop = dict(early_stop_stats)
+    return jsonify({
+        "client": ollama_client.stats(),
+        "breaker": ollama_breaker.stats(),
+        "early_stop": early_stop,
+        "single_flight": generation_flight.stats(),
+        "model": model_status_report()
+    })
+
+
 #api endpoint for generating questions
 @app.route('/api/generate-questions', methods=['POST'])
 def generate_questions_api():
     data = request.get_json()
-    notes_content = data.get('notesContent', '')
+    notes_content = notes_from_request(data)
+    if notes_content is None:
+        return jsonify({"error": "Unknown or expired documentId"}), 404
     practice_mode = data.get('practiceMode', 'multiple-choice')
     difficulty_level = data.get('difficultyLevel', 'beginner')
     count = data.get('count', 5)
+    fresh = bool(data.get('fresh', False))
     
     print(f"Generating questions: {practice_mode}, {difficulty_level}, {count}")
+
+    started = time.perf_counter()
+    with tracer.span('generate_questions') as span:
+        questions, source = generate_question_set(notes_content, practice_mode, difficulty_level, count, fresh)
+    request_seconds.observe(
+        time.perf_counter() - started,
+        endpoint='generate', source=source, **metric_labels(practice_mode, difficulty_level)
+    )
+    if source == 'cache':
+        response = jsonify({"questions": questions, "cached": True, "source": source})
+    else:
+        response = jsonify({"questions": questions, "source": source})
+    if span.trace_id:
+        response.headers['X-Trace-Id'] = span.trace_id
+    return response
+
+def generate_question_set(
+    notes_content: str,
+    practice_mode: str,
+    difficulty_level: str,
+    count: int,
+    fresh: bool = False,
+    on_progress: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+) -> Tuple[List[Dict[str, Any]], str]:
+    """The full generation pipeline: cache, then ollama (shared with identical requests), then local fallback.
+
+    Returns the questions and where they came from: 'cache', 'ollama', 'shared' or 'local'.
+    """
+    with tracer.span(
+        'generate_question_set',
+        mode=practice_mode, difficulty=difficulty_level, count=count, notes_length=len(notes_content), fresh=fresh
+    ) as span:
+        questions, source = _generate_question_set(notes_content, practice_mode, difficulty_level, count, fresh, on_progress)
+        span.set(source=source, returned=len(questions))
+        return questions, source
+
+def _generate_question_set(notes_content, practice_mode, difficulty_level, count, fresh, on_progress):
+    key = question_cache_key(notes_content, practice_mode, difficulty_level, count)
+    cached = lookup_cached_questions(key, fresh)
+    if cached is not None:
+        return cached, 'cache'
     
     try:
-        questions = attempt_ollama(notes_content, practice_mode, difficulty_level, count)
-        return jsonify({"questions": questions})
+        #both endpoints' leaders publish (questions, how many of them were made locally)
+        (questions, padded), shared = generation_flight.do(
+            key, lambda: attempt_ollama(notes_content, practice_mode, difficulty_level, count, on_progress),
+            timeout=SHARED_WAIT_TIMEOUT
+        )
+        #a set ollama wrote none of is local questions; caching it would serve templates for a day
+        if padded >= len(questions):
+            print("Ollama produced none of the questions, not caching the local ones")
+            return questions, 'local'
+        if shared:
+            print("Reusing questions from an identical request already in progress")
+            return questions, 'shared'
+        store_cached_questions(key, questions)
+        return questions, 'ollama'
     except Exception as error:
         print(f"Error with Ollama API: {error}")
+        current_span().set(ollama_error=f"{type(error).__name__}: {error}")
         
         print("Falling back to local question generation...")
         questions = simulate_ai_generation(notes_content, practice_mode, difficulty_level, count)
-        return jsonify({"questions": questions})
-    
-def create_prompt(notes_content: str, practice_mode: str, difficulty_level: str, count: int) -> str:
-    """Create an improved prompt based on question type to get better model responses."""
-    content = clean_notes(notes_content[:1500]) #token limit*
-    base_prompt = f"""You are an expert educator. Generate {count} {difficulty_level} level questions based on these notes:
+        return questions, 'local'
+
+def run_generation_job(job) -> Dict[str, Any]:
+    params = job.params
+    with tracer.span('generation_job', job_id=job.id):
+        questions, source = generate_question_set(
+            params['notesContent'], params['practiceMode'], params['difficultyLevel'], params['count'],
+            params['fresh'], on_progress=job.set_partial
+        )
+    return {"questions": questions, "cached": source == 'cache'}
 
-{content}
+generation_jobs = JobManager(run_generation_job, max_workers=JOB_WORKERS, max_queue=JOB_MAX_QUEUE, ttl=JOB_TTL)
 
-"""
-    
-    if practice_mode == 'multiple-choice':
-        return base_prompt + f"""
-Generate EXACTLY {count} multiple choice questions with 4 options (A, B, C, D) and answers.
-Format each question EXACTLY like this:
+@app.route('/api/jobs', methods=['POST'])
+def create_generation_job():
+    """Start generating questions in the background and return a job id to poll."""
+    data = request.get_json()
+    notes_content = notes_from_request(data)
+    if notes_content is None:
+        return jsonify({"error": "Unknown or expired documentId"}), 404
+    params = {
+        'notesContent': notes_content,
+        'practiceMode': data.get('practiceMode', 'multiple-choice'),
+        'difficultyLevel': data.get('difficultyLevel', 'beginner'),
+        'count': data.get('count', 5),
+        'fresh': bool(data.get('fresh', False)),
+    }
+    try:
+        job = generation_jobs.submit(params)
+    except QueueFullError as error:
+        return jsonify({"error": str(error)}), 429
+
+    print(f"Queued generation job {job.id}: {params['practiceMode']}, {params['difficultyLevel']}, {params['count']}")
+    return jsonify({"jobId": job.id, "status": job.status}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    """Job status, with the questions so far while it runs and the final result once done."""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def generation_job_stats():
+    """Queue depth and job counts by status."""
+    return jsonify(generation_jobs.stats())
+    
+@app.route('/api/generate-questions/stream', methods=['POST'])
+def generate_questions_stream_api():
+    """Same as /api/generate-questions, but sends each question as NDJSON as soon as it's parsed."""
+    data = request.get_json()
+    notes_content = notes_from_request(data)
+    if notes_content is None:
+        return jsonify({"error": "Unknown or expired documentId"}), 404
+    practice_mode = data.get('practiceMode', 'multiple-choice')
+    difficulty_level = data.get('difficultyLevel', 'beginner')
+    count = data.get('count', 5)
+    fresh = bool(data.get('fresh', False))
+
+    print(f"Streaming questions: {practice_mode}, {difficulty_level}, {count}")
+
+    key = question_cache_key(notes_content, practice_mode, difficulty_level, count)
+    cached = lookup_cached_questions(key, fresh)
+    started = time.perf_counter()
+    trace_id = new_trace_id()
+
+    def observe(source: str):
+        current_span().set(source=source)
+        request_seconds.observe(
+            time.perf_counter() - started,
+            endpoint='stream', source=source, **metric_labels(practice_mode, difficulty_level)
+        )
+
+    def generate():
+        with tracer.span(
+            'generate_questions_stream', trace_id=trace_id,
+            mode=practice_mode, difficulty=difficulty_level, count=count, notes_length=len(notes_content), fresh=fresh
+        ):
+            yield from generate_lines()
+
+    def generate_lines():
+        if cached is not None:
+            for question in cached:
+                yield json.dumps({"question": question}) + "\n"
+            yield json.dumps({"done": True, "count": len(cached), "cached": True}) + "\n"
+            observe('cache')
+            return
+
+        call, leader = generation_flight.begin(key)
+        if not leader:
+            #an identical request is already generating, wait for its questions instead
+            try:
+                questions, padded = generation_flight.wait(call, SHARED_WAIT_TIMEOUT)
+                if padded >= len(questions):
+                    source = 'local'
+                    print("Identical request in progress produced only local questions")
+                else:
+                    source = 'shared'
+                    print("Reusing questions from an identical request already in progress")
+            except SharedCallError as error:
+                print(f"Error with Ollama API: {error}")
+                print("Falling back to local question generation...")
+                questions = simulate_ai_generation(notes_content, practice_mode, difficulty_level, count)
+                source = 'local'
+            for question in questions:
+                yield json.dumps({"question": question}) + "\n"
+            yield json.dumps({"done": True, "count": len(questions)}) + "\n"
+            observe(source)
+            return
+
+        questions = []
+        ollama_error = None
+        try:
+            try:
+                for question in stream_with_ollama(notes_content, practice_mode, difficulty_level, count):
+                    questions.append(question)
+                    yield json.dumps({"question": question}) + "\n"
+            except Exception as error:
+                print(f"Error with Ollama API: {error}")
+                ollama_error = error
+
+            sent = len(questions)
+            from_ollama = sent  #questions the model wrote, top-ups included
+            extra = []
+            if sent < count:
+                if ollama_error is None:
+                    parse_shortfall.inc(count - sent, **metric_labels(practice_mode, difficulty_level))
+                #nothing streamed is a short answer too: ollama gets another go within the latency budget
+                print(f"Only streamed {sent} questions, topping up {count - sent}")
+                extra, padded = top_up_questions(
+                    notes_content, practice_mode, difficulty_level, count - sent, questions, started
+                )
+                from_ollama += len(extra) - padded
+                extra = extra[:count - sent]
+            questions = questions + extra
+
+            #same rule as the non-streaming endpoint: only cache and share sets that came from ollama.
+            #published before the last lines are written so waiters don't depend on this client reading them
+            if ollama_error is None and from_ollama:
+                store_cached_questions(key, questions)
+                generation_flight.finish(key, call, result=(questions, len(questions) - from_ollama))
+            else:
+                generation_flight.finish(key, call, error=ollama_error or Exception("No questions were generated"))
+
+            for question in extra:
+                yield json.dumps({"question": question}) + "\n"
+            yield json.dumps({"done": True, "count": len(questions)}) + "\n"
+            observe('ollama' if from_ollama else 'local')
+        finally:
+            #the client can disconnect mid-stream; don't leave waiters hanging
+            generation_flight.finish(key, call, error=Exception("Streaming request ended before it finished"))
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if tracer.enabled:
+        response.headers['X-Trace-Id'] = trace_id
+    return response
+
+@app.route('/api/generate-questions/batch', methods=['POST'])
+def generate_questions_batch_api():
+    """Generate questions for many documents at once.
+
+    Takes {"items": [{notesContent or documentId, practiceMode, difficultyLevel, count}, ...]} and streams
+    one NDJSON line per item as it finishes, tagged with the item's index.
+    """
+    data = request.get_json()
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of items"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many items ({len(items)}), the limit is {BATCH_MAX_ITEMS}"}), 400
+
+    print(f"Generating questions for a batch of {len(items)} items")
+
+    finished = queue.Queue()
+    futures = []
+    for index, item in enumerate(items):
+        future = batch_executor.submit(run_batch_item, item)
+        future.add_done_callback(lambda f, index=index: finished.put((index, f)))
+        futures.append(future)
+
+    def generate():
+        try:
+            for _ in range(len(items)):
+                index, future = finished.get()
+                try:
+                    questions, source = future.result()
+                    line = {"index": index, "questions": questions, "source": source}
+                except Exception as error:
+                    line = {"index": index, "error": str(error)}
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"done": True, "count": len(items)}) + "\n"
+        finally:
+            #client went away: don't generate items nobody will read
+            for future in futures:
+                future.cancel()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def run_batch_item(item: Any) -> Tuple[List[Dict[str, Any]], str]:
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be an object")
+
+    notes_content = notes_from_request(item)
+    if notes_content is None:
+        raise ValueError("Unknown or expired documentId")
+    practice_mode = item.get('practiceMode', 'multiple-choice')
+    difficulty_level = item.get('difficultyLevel', 'beginner')
+    count = item.get('count', 5)
+
+    if not isinstance(notes_content, str) or not notes_content.strip():
+        raise ValueError("notesContent is required")
+    if practice_mode not in PRACTICE_MODES:
+        raise ValueError(f"Unknown practiceMode: {practice_mode}")
+    if difficulty_level not in DIFFICULTY_LEVELS:
+        raise ValueError(f"Unknown difficultyLevel: {difficulty_level}")
+    if not isinstance(count, int) or not 1 <= count <= 50:
+        raise ValueError("count must be a number from 1 to 50")
+
+    return generate_question_set(notes_content, practice_mode, difficulty_level, count, bool(item.get('fresh', False)))
+
+@app.route('/api/documents', methods=['POST'])
+def upload_document():
+    """Store an uploaded PDF, DOCX or TXT file and extract its text on the server.
+
+    Returns a documentId that generation requests can send instead of notesContent.
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    try:
+        document = document_store.save(upload.stream, upload.filename)
+    except DocumentError as error:
+        print(f"Error processing upload {upload.filename}: {error}")
+        return jsonify({"error": str(error)}), 400
+
+    print(f"Stored document {document['documentId'][:12]} ({document['characters']} chars, cached={document['cached']})")
+    return jsonify(document), 200 if document['cached'] else 201
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({"error": f"Request is too large, the limit is {DOCUMENT_MAX_BYTES // (1024 * 1024)} MB"}), 413
+
+@app.route('/api/documents/<document_id>', methods=['GET'])
+def get_document(document_id):
+    document = document_store.metadata(document_id)
+    if document is None:
+        return jsonify({"error": "Unknown document"}), 404
+    return jsonify(document)
+
+def notes_from_request(data: Dict[str, Any]) -> Optional[str]:
+    """The notes to generate from: the uploaded document named by documentId, else notesContent.
+
+    None means the documentId doesn't exist.
+    """
+    document_id = data.get('documentId')
+    if document_id:
+        return document_store.text(document_id)
+    return data.get('notesContent', '')
+
+def question_cache_key(notes_content: str, practice_mode: str, difficulty_level: str, count: int) -> str:
+    """Cache key covering everything that changes the generated questions."""
+    return cache_key(
+        notes=clean_notes(notes_content),
+        mode=practice_mode,
+        difficulty=difficulty_level,
+        count=count,
+        model=OLLAMA_MODEL,
+        options=GENERATION_OPTIONS
+    )
+
+def lookup_cached_questions(key: str, fresh: bool) -> Optional[List[Dict[str, Any]]]:
+    """Return a cached question set, unless caching is off or the user asked for a fresh one."""
+    if not QUESTION_CACHE_ENABLED:
+        return None
+    if fresh:
+        question_cache.record_bypass()
+        return None
+
+    cached = question_cache.get(key)
+    if cached is not None:
+        print(f"Serving {len(cached)} cached questions")
+    return cached
+
+def store_cached_questions(key: str, questions: List[Dict[str, Any]]):
+    if QUESTION_CACHE_ENABLED and questions:
+        question_cache.set(key, questions)
+
+#one system message for every mode, so its processed tokens are a prefix ollama can reuse across all requests;
+#everything that varies (notes, then mode, count and difficulty) goes in the user message after it
+SYSTEM_PROMPT = """You are an expert educator who writes practice questions from a student's notes.
+
+Write every question in the format for its type, starting with the type's header line, and put a line of three equal signs (===) after each question. Only ask about what the notes cover.
+
+**Multiple Choice Question**
 Question: [question text]
 A) [option A]
 B) [option B]
 C) [option C]
 D) [option D]
 Answer: [correct letter]
-
-Make sure each question is complete with all 4 options and an answer.
-"""
-    elif practice_mode == 'true-false':
-        return base_prompt + f"""
-Generate EXACTLY {count} true/false questions.
-Format each question EXACTLY like this:
+===
+**True/False Question**
 Question: [statement]
 Answer: [True/False]
-
-Make sure each question has a clear True or False answer.
-"""
-    elif practice_mode == 'fill-blank':
-        return base_prompt + f"""
-Generate EXACTLY {count} fill-in-the-blank questions.
-Format each question EXACTLY like this:
+===
+**Fill-in-the-Blank Question**
 Question: [sentence with _____ for the blank]
 Answer: [word or phrase that goes in the blank]
-
-Make sure each question contains a blank marked with _____ and has an answer.
-"""
-    elif practice_mode == 'short-answer':
-        return base_prompt + f"""
-Generate EXACTLY {count} short-answer questions.
-Format each question EXACTLY like this:
+===
+**Short Answer Question**
 Question: [question requiring explanation]
 Key Terms: [key term 1], [key term 2], [key term 3]
+==="""
+
+#the same, for OLLAMA_FORMAT=json: the schema in the request enforces the fields, this tells the model what they mean
+JSON_SYSTEM_PROMPT = """You are an expert educator who writes practice questions from a student's notes.
+
+Answer with a JSON object {"questions": [...]} holding one object per question, in the format for its type. Only ask about what the notes cover.
+
+Multiple Choice format: {"type": "multiple-choice", "question": "[question text]", "options": ["[option A]", "[option B]", "[option C]", "[option D]"], "correctAnswerIndex": [0-3, the position of the correct option]}
+True/False format: {"type": "true-false", "question": "[statement]", "correctAnswer": [true/false]}
+Fill-in-the-Blank format: {"type": "fill-blank", "question": "[sentence with _____ for the blank]", "correctAnswer": "[word or phrase that goes in the blank]"}
+Short Answer format: {"type": "short-answer", "question": "[question requiring explanation]", "keyTerms": ["[key term 1]", "[key term 2]", "[key term 3]"]}"""
+
+MODE_REQUESTS = {
+    'multiple-choice': ("multiple choice", "Use the Multiple Choice format; make sure each question has all 4 options and an answer."),
+    'true-false': ("true/false", "Use the True/False format; make sure each question has a clear True or False answer."),
+    'fill-blank': ("fill-in-the-blank", "Use the Fill-in-the-Blank format; make sure each question contains a blank marked with _____ and has an answer."),
+    'short-answer': ("short-answer", "Use the Short Answer format; make sure each question includes at least 3 key terms."),
+    'random': ("mixed", "Mix multiple choice, true/false, fill-in-the-blank and short answer questions."),
+}
+
+def create_budgeted_messages(
+    notes_content: str, practice_mode: str, difficulty_level: str, count: int,
+    accepted: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """The chat messages with as much of the notes as fits next to the expected answer, and the budget behind it."""
+    template_tokens = messages_tokens(
+        create_messages('', practice_mode, difficulty_level, count, output_format=OLLAMA_FORMAT, accepted=accepted)
+    )
+    budget = plan_budget(template_tokens, practice_mode, count, OLLAMA_NUM_CTX, OLLAMA_OUTPUT_MARGIN, OLLAMA_FORMAT)
+    messages = create_messages(
+        notes_content, practice_mode, difficulty_level, count, budget["notes_tokens"],
+        output_format=OLLAMA_FORMAT, accepted=accepted
+    )
+
+    budget["notes_available_tokens"] = estimate_tokens(clean_notes(notes_content))
+    budget["notes_used_tokens"] = messages_tokens(messages) - template_tokens
+    print(f"Prompt budget: {budget['notes_used_tokens']} of {budget['notes_available_tokens']} notes tokens "
+          f"(room for {budget['notes_tokens']}), {template_tokens} instruction tokens, "
+          f"num_predict {budget['num_predict']} for ~{budget['expected_output_tokens']} expected, num_ctx {budget['num_ctx']}")
+    if budget["overflows"]:
+        print(f"Warning: {count} {practice_mode} questions don't fit in num_ctx {OLLAMA_NUM_CTX}, the notes may be truncated by ollama")
+    return messages, budget
+
+def create_messages(
+    notes_content: str, practice_mode: str, difficulty_level: str, count: int, notes_tokens: int = 375,
+    output_format: str = 'text', accepted: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, str]]:
+    """Chat messages asking for `count` questions: the shared system prompt, then the notes and the request.
+
+    The notes are cut to about notes_tokens, at a sentence boundary. output_format 'json'
+    uses the system prompt describing the JSON answer instead of the text layout. With
+    `accepted` (the questions a short answer did produce) it asks for `count` more, of the
+    types still missing, that don't repeat them.
+    """
+    #cleaning only shrinks text, so twice the budget of raw notes is plenty to clean and then cut
+    content = fit_to_budget(clean_notes(notes_content[:notes_tokens * CHARS_PER_TOKEN * 2]), notes_tokens)
+    kind, details = MODE_REQUESTS.get(practice_mode, MODE_REQUESTS['random'])
+    if accepted is None:
+        request_text = f"Generate EXACTLY {count} {kind} questions at {difficulty_level} level based on these notes. {details}"
+    else:
+        if practice_mode in MODE_REQUESTS and practice_mode != 'random':
+            request_text = f"Generate EXACTLY {count} more {kind} questions at {difficulty_level} level based on these notes. {details}"
+        else:
+            request_text = (f"Generate EXACTLY {count} more questions at {difficulty_level} level based on these notes: "
+                            f"{describe_types(missing_types(accepted, count))}. Use the format for each type.")
+        written = "\n".join(f"- {question['question']}" for question in accepted)
+        request_text += f"\n\nThese questions are already written, so don't repeat them or ask about the same facts:\n{written}"
+    return [
+        {"role": "system", "content": JSON_SYSTEM_PROMPT if output_format == 'json' else SYSTEM_PROMPT},
+        {"role": "user", "content": f"""Notes:
 
-Make sure each question includes at least 3 key terms.
-"""
-    elif practice_mode == 'random':
-        return base_prompt + f"""
-Generate EXACTLY {count} mixed questions including multiple choice, true/false, fill-in-blank, and short answer.
+{content}
 
-Use these formats:
----
-**Multiple Choice Question**
-Question: ...
-A) ...
-B) ...
-C) ...
-D) ...
-Answer: B
----
-**True/False Question**
-Question: ...
-Answer: True
----
-**Fill-in-the-Blank Question**
-Question: The main cause of this issue is _____.
-Answer: stress
----
-**Short Answer Question**
-Question: Explain the effects of isolation on mental health.
-Key Terms: loneliness, depression, support
+{request_text}"""},
+    ]
 
-Separate each question with a line of three equal signs:
-===
-"""
+QUESTION_TYPES = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer']
+
+def missing_types(accepted: List[Dict[str, Any]], count: int) -> List[str]:
+    """Types for `count` more random-mode questions, the ones least represented in `accepted` first."""
+    have = {question_type: 0 for question_type in QUESTION_TYPES}
+    for question in accepted:
+        if question.get('type') in have:
+            have[question['type']] += 1
+    types = []
+    for _ in range(count):
+        question_type = min(QUESTION_TYPES, key=lambda t: have[t])
+        have[question_type] += 1
+        types.append(question_type)
+    return types
 
-    return base_prompt + f"Generate EXACTLY {count} questions with clear questions and answers."
+def describe_types(types: List[str]) -> str:
+    """e.g. "2 multiple choice and 1 true/false" """
+    counts = {question_type: types.count(question_type) for question_type in QUESTION_TYPES if question_type in types}
+    parts = [f"{n} {MODE_REQUESTS[question_type][0]}" for question_type, n in counts.items()]
+    return parts[0] if len(parts) == 1 else ", ".join(parts[:-1]) + " and " + parts[-1]
 
 def attempt_ollama(
     notes_content: str, 
     practice_mode: str, 
     difficulty_level: str, 
-    count: int
-) -> List[Dict[str, Any]]:
-    """Try to generate questions using Ollama with retries on failure."""
+    count: int,
+    on_progress: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Try to generate questions using Ollama with retries on failure.
+
+    Returns the questions and how many of them were made locally (see generate_with_ollama).
+    """
     max_retries = 3
     base_delay = 1  
+    started = time.perf_counter()  #retries and top-ups share one latency budget
+    failed_backends = set()  #retries go to another ollama backend while there is one
     
     for attempt in range(max_retries):
+        used = set()
         try:
             print(f"Attempting Ollama generation, attempt {attempt+1}/{max_retries}")
-            questions = generate_with_ollama(notes_content, practice_mode, difficulty_level, count)
+            with tracer.span('ollama.attempt', attempt=attempt + 1) as span, ollama_client.routing(avoid=failed_backends) as used:
+                questions, padded = generate_with_ollama(
+                    notes_content, practice_mode, difficulty_level, count, on_progress, started
+                )
+                span.set(returned=len(questions), padded=padded, backends=sorted(used))
             print(f"Success with Ollama")
-            return questions
+            return questions, padded
         except Exception as error:
             print(f"Failed attempt {attempt+1}: {error}")
+            failed_backends |= used
+            #no point backing off and retrying once the breaker has given up on ollama
+            if isinstance(error, CircuitOpenError) or ollama_breaker.state == 'open':
+                raise error
             if attempt < max_retries - 1:
+                ollama_retries.inc(**metric_labels(practice_mode, difficulty_level))
+                if ollama_client.has_alternative(failed_backends):
+                    print(f"Retrying on another Ollama backend (not {', '.join(sorted(failed_backends))})")
+                    continue
                 delay = base_delay * (2 ** attempt)  #exponential backoff
                 print(f"Retrying in {delay} seconds...")
                 time.sleep(delay)
@@ -198,126 +896,371 @@ def generate_with_ollama(
     notes_content: str, 
     practice_mode: str, 
     difficulty_level: str, 
-    count: int
-) -> List[Dict[str, Any]]:
-    """Generate questions using Ollama."""
-    prompt = create_prompt(notes_content, practice_mode, difficulty_level, count)
-
-    timeout = 90  
-    
+    count: int,
+    on_progress: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    started: Optional[float] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Generate questions using Ollama.
+
+    Returns the questions and how many of them were padded in locally because Ollama's
+    answer (and its top-up) came up short.
+
+    on_progress, if given, is called with the questions parsed so far each time a new one arrives.
+    started (a time.perf_counter() value) is when the request began, for the top-up's latency budget.
+    """
+    started = time.perf_counter() if started is None else started
     try:
-        response = requests.post(
-            f"{OLLAMA_API_URL}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "num_predict": 2048 #limit is 1500 though but for longer stuff
-                }
-            },
-            timeout=timeout
-        )
-        
-        if response.status_code != 200:
-            print(f"API Error: {response.status_code} {response.reason}")
-            error_text = response.text
-            raise Exception(f"Ollama API error: {response.status_code} - {error_text}")
-        
-        result = response.json()
-        
-        generated_text = result.get("response", "")
-        
-        if not generated_text:
-            raise Exception("No text was generated by the model")
-        
-        print(f"Generated text length: {len(generated_text)}")
-        
-
-        questions = parse_questions(generated_text, practice_mode, count)
-
+        questions = []
+        padded = 0
+        for question in stream_with_ollama(notes_content, practice_mode, difficulty_level, count):
+            questions.append(question)
+            if on_progress:
+                on_progress(questions)
+
+        current_span().set(parsed_count=len(questions))
         if len(questions) < count:
-            print(f"Only parsed {len(questions)} questions, adding {count - len(questions)} fallback questions")
-            additional_questions = generate_fallback_questions(
-                notes_content, practice_mode, difficulty_level, count - len(questions)
+            print(f"Only parsed {len(questions)} questions, topping up {count - len(questions)}")
+            parse_shortfall.inc(count - len(questions), **metric_labels(practice_mode, difficulty_level))
+            additional_questions, padded = top_up_questions(
+                notes_content, practice_mode, difficulty_level, count - len(questions), questions, started
             )
             questions.extend(additional_questions)
+            if on_progress:
+                on_progress(questions)
         
-        return questions[:count]  
+        return questions[:count], padded
     
-    except requests.exceptions.Timeout:
+    except OllamaTimeoutError:
         raise Exception(f"Request to Ollama timed out")
     except Exception as e:
         raise e
 
 # 
 
-def parse_questions(text: str, practice_mode: str, requested_count: int) -> List[Dict[str, Any]]:
-    """Parse LLM-generated text into structured question objects."""
-    print(f"Parsing generated text (first 200 chars): {text[:200]}...")
-    questions = []
+def stream_with_ollama(
+    notes_content: str,
+    practice_mode: str,
+    difficulty_level: str,
+    count: int
+) -> Iterator[Dict[str, Any]]:
+    """Generate questions with Ollama, yielding each one as soon as it's parsed.
+
+    Notes that fit in one prompt get a single request (one per question type in random mode);
+    longer notes are split into chunks so questions cover the whole document rather than
+    just the first page.
+    """
+    chunks = split_into_chunks(notes_content, CHUNK_TOKENS) if CHUNKED_GENERATION else []
+    if len(chunks) <= 1:
+        yield from stream_notes_with_ollama(notes_content, practice_mode, difficulty_level, count)
+        return
 
-    blocks = re.split(r'\n?={3,}\n?', text)
-    print(f"Found {len(blocks)} blocks after splitting.")
+    yield from stream_chunks_with_ollama(chunks, practice_mode, difficulty_level, count)
 
-    for block in blocks:
-        block = block.strip()
-        if not block:
+def stream_chunks_with_ollama(
+    chunks: List[str],
+    practice_mode: str,
+    difficulty_level: str,
+    count: int
+) -> Iterator[Dict[str, Any]]:
+    """Map-reduce generation: ask each chunk for its share of `count` in parallel, then merge and dedup.
+
+    Questions are yielded in the order they finish, so wall-clock time is bounded by the
+    slowest chunk rather than one giant prompt.
+    """
+    plan = allocate_counts(chunks, count)
+    print(f"Generating {count} questions from {len(plan)} of {len(chunks)} chunks")
+    current_span().set(chunks=len(chunks), chunks_used=len(plan))
+
+    streams = [
+        lambda chunk=chunk, share=share: stream_notes_with_ollama(chunk, practice_mode, difficulty_level, share)
+        for chunk, share in plan
+    ]
+    seen = set()
+    for _, question in merge_streams(streams, CHUNK_MAX_PARALLEL):
+        fingerprint = question_fingerprint(question)
+        if fingerprint in seen:
             continue
+        seen.add(fingerprint)
+        yield question
+        #stop the other chunks once we have enough
+        if len(seen) >= count:
+            break
 
-        lowered = block.lower()
+def stream_notes_with_ollama(
+    notes_content: str,
+    practice_mode: str,
+    difficulty_level: str,
+    count: int
+) -> Iterator[Dict[str, Any]]:
+    """Questions from notes that fit in one prompt: one request, or one per type in random mode.
+
+    The fan-out takes a slot per type, so it only happens while that many are free; once
+    ollama is saturated, the extra prompt processing would cost more than it saves.
+    """
+    fan_out = min(count, len(QUESTION_TYPES))
+    if practice_mode == 'random' and RANDOM_FANOUT and count > 1 and ollama_client.free_slots() >= fan_out:
+        yield from stream_random_with_ollama(notes_content, difficulty_level, count)
+    else:
+        yield from stream_chunk_with_ollama(notes_content, practice_mode, difficulty_level, count)
+
+def stream_random_with_ollama(notes_content: str, difficulty_level: str, count: int) -> Iterator[Dict[str, Any]]:
+    """Random mode fanned out: a focused request per question type, sized to a random split of `count`.
+
+    A single-type prompt is shorter to answer and easier to parse than a mix of four
+    formats, and the requests run at once, so wall-clock time is that of the slowest one.
+    Each question is yielded as soon as it arrives; the requests decode side by side, so the
+    set comes out interleaved rather than grouped by type, and a slow or failed type never
+    holds back the others.
+    """
+    split = random_split(count)
+    current_span().set(fanout=split)
+
+    types = list(split)
+    streams = [
+        lambda question_type=question_type: stream_chunk_with_ollama(
+            notes_content, question_type, difficulty_level, split[question_type], metric_mode='random'
+        )
+        for question_type in types
+    ]
+    remaining = dict(split)  #questions still wanted of each type
+    for index, question in merge_streams(streams, len(streams)):
+        question_type = types[index]
+        if remaining[question_type] > 0:
+            remaining[question_type] -= 1
+            yield question
+
+def random_split(count: int) -> Dict[str, int]:
+    """`count` spread as evenly as possible over the question types, the remainder to random ones."""
+    types = random.sample(QUESTION_TYPES, len(QUESTION_TYPES))
+    split = {question_type: count // len(types) + (1 if i < count % len(types) else 0) for i, question_type in enumerate(types)}
+    return {question_type: share for question_type, share in split.items() if share}
+
+def merge_streams(
+    streams: List[Callable[[], Iterator[Dict[str, Any]]]],
+    max_parallel: int
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Run question streams in parallel threads, yielding (stream index, question) as each question arrives.
+
+    The other streams are stopped once the caller stops reading. A stream that fails is
+    skipped; its error is raised only if no stream produced a question.
+    """
+    results = queue.Queue()
+    cancelled = threading.Event()
+
+    def run(index: int, stream: Callable[[], Iterator[Dict[str, Any]]]):
+        try:
+            with closing(stream()) as questions:
+                for question in questions:
+                    if cancelled.is_set():
+                        break
+                    results.put(('question', index, question))
+        except Exception as error:
+            results.put(('error', index, error))
+        finally:
+            results.put(('done', index, None))
+
+    executor = ThreadPoolExecutor(max_workers=min(max_parallel, len(streams)))
+    for index, stream in enumerate(streams):
+        #each worker gets a copy of our context so its spans land in this trace
+        executor.submit(contextvars.copy_context().run, run, index, stream)
+
+    errors = []
+    produced = False
+    pending = len(streams)
+    try:
+        while pending:
+            kind, index, value = results.get()
+            if kind == 'done':
+                pending -= 1
+            elif kind == 'error':
+                print(f"Parallel generation {index + 1}/{len(streams)} failed: {value}")
+                errors.append(value)
+            else:
+                produced = True
+                yield index, value
+    finally:
+        #stop the others once the caller has enough (or went away)
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not produced and errors:
+        raise errors[0]
+
+def stream_chunk_with_ollama(
+    notes_content: str,
+    practice_mode: str,
+    difficulty_level: str,
+    count: int,
+    accepted: Optional[List[Dict[str, Any]]] = None,
+    deadline: Optional[float] = None,
+    metric_mode: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Generate questions for one prompt with Ollama streaming on, yielding each one as soon as its block is complete.
+
+    With OLLAMA_EARLY_STOP on, the upstream request is closed as soon as `count` questions
+    have been parsed, so Ollama stops decoding tokens nobody will use. `accepted` makes it a
+    top-up request for `count` more questions (see create_messages); `deadline` overrides
+    OLLAMA_DEADLINE for the call. `metric_mode` is the request's mode for metrics and the
+    trace when `practice_mode` is only the part of it this prompt asks for (random mode's fan-out).
+
+    Raises CircuitOpenError without calling Ollama while the circuit breaker is open.
+    """
+    metric_mode = metric_mode or practice_mode
+    with tracer.span(
+        'ollama.generate', mode=metric_mode, question_type=practice_mode, count=count,
+        notes_length=len(notes_content), top_up=accepted is not None
+    ):
+        yield from _stream_chunk_with_ollama(
+            notes_content, practice_mode, difficulty_level, count, accepted, deadline, metric_mode
+        )
 
-        if 'multiple choice question' in lowered:
-            match = re.search(
-                r'Question:(.*?)\nA\)(.*?)\nB\)(.*?)\nC\)(.*?)\nD\)(.*?)\nAnswer:\s*([A-Da-d])',
-                block, re.DOTALL
-            )
-            if match:
-                q, a, b, c, d, ans = [m.strip() for m in match.groups()]
-                index = 'ABCD'.index(ans.upper())
-                questions.append({
-                    'type': 'multiple-choice',
-                    'question': q,
-                    'options': [a, b, c, d],
-                    'correctAnswerIndex': index
-                })
+def _stream_chunk_with_ollama(notes_content, practice_mode, difficulty_level, count, accepted=None, deadline=None,
+                              metric_mode=None):
+    span = current_span()
+    permit = ollama_breaker.allow()
+    if permit is None:
+        raise CircuitOpenError("Ollama circuit is open, skipping the request")
+
+    labels = metric_labels(metric_mode or practice_mode, difficulty_level)
+    with stage_seconds.time(stage='prompt', **labels):
+        messages, budget = create_budgeted_messages(notes_content, practice_mode, difficulty_level, count, accepted)
+    span.set(prompt_length=sum(len(message["content"]) for message in messages), **budget)
+
+    num_predict = budget["num_predict"]
+
+    payload = {
+        "model": OLLAMA_MODEL,
+        "messages": messages,
+        "options": {**GENERATION_OPTIONS, "num_predict": num_predict},
+        "keep_alive": OLLAMA_KEEP_ALIVE
+    }
+    if OLLAMA_FORMAT == 'json':
+        payload["format"] = questions_schema(practice_mode, count)
+        parser = JsonQuestionStreamParser(count, practice_mode)
+    else:
+        parser = QuestionStreamParser(count)
+    chunks = ollama_client.stream_chat(payload, deadline)
+
+    started = time.time()
+    first_token_latency = None
+    outcome_recorded = False
+    #time blocked on ollama and time spent parsing, kept apart so a slow model and a slow parser don't look alike
+    ollama_seconds = 0.0
+    parse_seconds = 0.0
+    generated_length = 0
+    output = [] if span.sampled else None  #raw text, only kept for sampled traces
+
+    #closing() hands the connection and concurrency slot back as soon as we stop reading
+    try:
+        with closing(chunks):
+            tokens_generated = 0  #ollama streams one token per chunk
+            stopped_early = False
+
+            waiting_since = time.perf_counter()
+            for chunk in chunks:
+                ollama_seconds += time.perf_counter() - waiting_since
+                if first_token_latency is None:
+                    first_token_latency = time.time() - started
+                if chunk.get("done"):
+                    tokens_generated = chunk.get("eval_count", tokens_generated)
+                    record_ollama_eval(chunk, labels)
+                    span.set(
+                        eval_count=chunk.get("eval_count"),
+                        eval_ms=chunk.get("eval_duration", 0) / 1e6,
+                        prompt_eval_ms=chunk.get("prompt_eval_duration", 0) / 1e6
+                    )
+                    break
+
+                text = chunk.get("message", {}).get("content", "")
+                generated_length += len(text)
+                if output is not None:
+                    output.append(text)
+                tokens_generated += 1
+                parse_started = time.perf_counter()
+                questions = parser.feed(text)
+                parse_seconds += time.perf_counter() - parse_started
+                yield from questions
+
+                if parser.finished and OLLAMA_EARLY_STOP:
+                    stopped_early = True
+                    break
+                waiting_since = time.perf_counter()
+
+            if not generated_length:
+                raise Exception("No text was generated by the model")
+
+            ollama_breaker.record_success(permit, first_token_latency)
+            outcome_recorded = True
+            parse_started = time.perf_counter()
+            questions = parser.close()
+            parse_seconds += time.perf_counter() - parse_started
+            yield from questions
+    except Exception as error:
+        if isinstance(error, OllamaTimeoutError):
+            ollama_timeouts.inc(**labels)
+        if not outcome_recorded:
+            #while another backend is in rotation the pool routes around a failing one;
+            #the breaker is for when ollama as a whole is failing
+            if ollama_client.can_fail_over():
+                ollama_breaker.release(permit)
+            else:
+                ollama_breaker.record_failure(permit)
+            outcome_recorded = True
+        raise
+    finally:
+        if not outcome_recorded:
+            #the caller stopped reading; ollama answering at all is enough to count as working
+            if first_token_latency is not None:
+                ollama_breaker.record_success(permit, first_token_latency)
+            else:
+                ollama_breaker.release(permit)
+        stage_seconds.observe(ollama_seconds, stage='ollama', **labels)
+        stage_seconds.observe(parse_seconds, stage='parse', **labels)
+        parsed_questions.inc(parser.parsed, format=OLLAMA_FORMAT, parser=parser.parser, **labels)
+        span.set(
+            generated_length=generated_length,
+            parsed_count=parser.parsed,
+            output_format=OLLAMA_FORMAT,
+            parser=parser.parser,
+            first_token_ms=round(first_token_latency * 1000, 1) if first_token_latency is not None else None,
+            ollama_ms=round(ollama_seconds * 1000, 1),
+            parse_ms=round(parse_seconds * 1000, 3)
+        )
+        if output is not None:
+            span.event('model_output', text=''.join(output))
 
-        elif 'true/false question' in lowered or 'true or false' in lowered:
-            match = re.search(r'Question:(.*?)\nAnswer:\s*(True|False)', block, re.DOTALL | re.IGNORECASE)
-            if match:
-                q, ans = [m.strip() for m in match.groups()]
-                questions.append({
-                    'type': 'true-false',
-                    'question': q if q.lower().startswith("true or false") else f"True or False: {q}",
-                    'correctAnswer': ans.lower() == 'true'
-                })
+    print(f"Generated text length: {generated_length}")
+    span.set(stopped_early=stopped_early, tokens=tokens_generated)
+    if stopped_early:
+        record_early_stop(tokens_generated, num_predict)
 
-        elif 'fill-in-the-blank question' in lowered:
-            match = re.search(r'Question:(.*?)\nAnswer:\s*(.*)', block, re.DOTALL)
-            if match:
-                q, ans = [m.strip() for m in match.groups()]
-                questions.append({
-                    'type': 'fill-blank',
-                    'question': q.replace('[BLANK]', '_____').replace('blank', '_____'),
-                    'correctAnswer': ans
-                })
 
-        elif 'short answer question' in lowered:
-            match = re.search(r'Question:(.*?)\n(?:Key Terms:|Keywords:)(.*)', block, re.DOTALL)
-            if match:
-                q, keywords = [m.strip() for m in match.groups()]
-                terms = [term.strip() for term in re.split(r',|;', keywords) if term.strip()]
-                questions.append({
-                    'type': 'short-answer',
-                    'question': q,
-                    'keyTerms': terms
-                })
+def record_ollama_eval(chunk: Dict[str, Any], labels: Dict[str, str]):
+    """Ollama's own accounting from the final chunk of a response (durations are in nanoseconds)."""
+    if "eval_count" in chunk:
+        ollama_eval_tokens.observe(chunk["eval_count"], **labels)
+    if "eval_duration" in chunk:
+        ollama_eval_seconds.observe(chunk["eval_duration"] / 1e9, **labels)
+    if "prompt_eval_duration" in chunk:
+        ollama_prompt_eval_seconds.observe(chunk["prompt_eval_duration"] / 1e9, **labels)
 
-        if len(questions) >= requested_count:
-            break
 
+def record_early_stop(tokens_generated: int, num_predict: int):
+    """Keep track of how many tokens closing the stream early saved."""
+    tokens_saved = max(0, num_predict - tokens_generated)
+    with early_stop_lock:
+        early_stop_stats["requests"] += 1
+        early_stop_stats["tokens_generated"] += tokens_generated
+        early_stop_stats["tokens_saved"] += tokens_saved
+    print(f"Stopped generation early after {tokens_generated} tokens, saved up to {tokens_saved} of {num_predict}")
+
+
+def parse_questions(text: str, practice_mode: str, requested_count: int) -> List[Dict[str, Any]]:
+    """Parse LLM-generated text into structured question objects."""
+    with tracer.span('parse', text_length=len(text), requested=requested_count) as span:
+        span.event('model_output', text=text)
+        questions = parse_blocks(text, requested_count)
+        span.set(parsed_count=len(questions))
     print(f"Successfully parsed {len(questions)} questions.")
     return questions
 
@@ -329,12 +1272,10 @@ def create_from_extracted(questions: List[Dict[str, Any]], question_type: str, q
     
     if question_type == 'multiple-choice':
         options = []
-        option_pattern = r'(?:A\)|A\.)(.*?)(?:B\)|B\.)(.*?)(?:C\)|C\.)(.*?)(?:D\)|D\.)(.*)'
-        option_match = re.search(option_pattern, question_part, re.DOTALL)
+        option_split = split_options(question_part)
         
-        if option_match:
-            clean_question = re.sub(option_pattern, '', question_part, flags=re.DOTALL).strip()
-            options = [group.strip() for group in option_match.groups()]
+        if option_split:
+            clean_question, options = option_split
         else:
             clean_question = question_part
             options = generate_default_options(question_part)
@@ -456,29 +1397,18 @@ Answer: [answer]
     timeout = min(45, 30 + (count * 3))  
     
     try:
-        response = requests.post(
-            f"{OLLAMA_API_URL}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.6, 
-                    "top_p": 0.85,
-                    "num_predict": max(512, 200 * count), 
-                    "top_k": 30,
-                    "repeat_penalty": 1.2
-                }
-            },
-            timeout=timeout
-        )
-        
-        if response.status_code != 200:
-            print(f"API Error: {response.status_code} {response.reason}")
-            error_text = response.text
-            raise Exception(f"Ollama API error: {response.status_code} - {error_text}")
+        result = ollama_client.generate({
+            "model": OLLAMA_MODEL,
+            "prompt": prompt,
+            "options": {
+                "temperature": 0.6, 
+                "top_p": 0.85,
+                "num_predict": max(512, 200 * count), 
+                "top_k": 30,
+                "repeat_penalty": 1.2
+            }
+        }, deadline=timeout)
         
-        result = response.json()
         generated_text = result.get("response", "")
         
         if not generated_text:
@@ -498,7 +1428,7 @@ Answer: [answer]
         
         return questions[:count]  
     
-    except requests.exceptions.Timeout:
+    except OllamaTimeoutError:
         print(f"Request to Ollama timed out")
         return []
     except Exception as e:
@@ -509,25 +1439,21 @@ def parse_simplified_questions(text: str, practice_mode: str, count: int) -> Lis
     """Parse questions from a simplified text format."""
     questions = []
 
-    qa_pairs = re.finditer(r"Question:(.*?)Answer:(.*?)(?=Question:|$)", text, re.DOTALL | re.IGNORECASE)
-    
-    for match in qa_pairs:
+    for q_text, a_text in split_qa_pairs(text):
         if len(questions) >= count:
             break
             
-        q_text = match.group(1).strip()
-        a_text = match.group(2).strip()
+        q_text = q_text.strip()
+        a_text = a_text.strip()
         
         if not q_text or not a_text:
             continue
             
         if practice_mode == 'multiple-choice':
-            options_pattern = r'(?:A[\.\)])(.*?)(?:B[\.\)])(.*?)(?:C[\.\)])(.*?)(?:D[\.\)])(.*)'
-            option_match = re.search(options_pattern, q_text, re.DOTALL)
+            option_split = split_options(q_text)
             
-            if option_match:
-                clean_question = re.sub(options_pattern, '', q_text, flags=re.DOTALL).strip()
-                options = [group.strip() for group in option_match.groups()]
+            if option_split:
+                clean_question, options = option_split
                 
                 correct_answer_index = 0
                 if re.search(r'\b[aA]\b', a_text):
@@ -625,12 +1551,10 @@ def parse_simplified_questions(text: str, practice_mode: str, count: int) -> Lis
         
         else:  
             if re.search(r'A\)|A\.|B\)|B\.', q_text):
-                options_pattern = r'(?:A[\.\)])(.*?)(?:B[\.\)])(.*?)(?:C[\.\)])(.*?)(?:D[\.\)])(.*)'
-                option_match = re.search(options_pattern, q_text, re.DOTALL)
+                option_split = split_options(q_text)
                 
-                if option_match:
-                    clean_question = re.sub(options_pattern, '', q_text, flags=re.DOTALL).strip()
-                    options = [group.strip() for group in option_match.groups()]
+                if option_split:
+                    clean_question, options = option_split
                     
                     correct_answer_index = 0
                     if re.search(r'\b[aA]\b', a_text):
@@ -683,27 +1607,26 @@ def create_basic_fallback_questions(notes_content: str, practice_mode: str, coun
     """Create very basic fallback questions when parsing fails."""
     fallback_questions = []
     
-    sentences = re.split(r'[.!?]\s+', notes_content)
-    sentences = [s.strip() + '.' for s in sentences if len(s.strip()) > 10]
-    
-    usable_sentences = sentences[:min(len(sentences), count * 2)]
+    usable_sentences = notes_indexes.get(notes_content).basic_sentences[:count * 2]
     
     for i in range(min(count, len(usable_sentences))):
-        if i >= len(usable_sentences):
-            break
+        sentence = usable_sentences[i]
+        question_type = practice_mode
+        if practice_mode not in ('multiple-choice', 'true-false', 'fill-blank', 'short-answer'):  # random
+            question_type = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer'][i % 4]
             
-        if practice_mode == 'multiple-choice':
-            fallback_questions.append(create_basic_mc_question(usable_sentences[i], "", extract_keywords2(usable_sentences[i])))
+        if question_type == 'multiple-choice':
+            fallback_questions.append(create_basic_mc_question(sentence.text, "", sentence.keywords))
             
-        elif practice_mode == 'true-false':
+        elif question_type == 'true-false':
             fallback_questions.append({
                 'type': 'true-false',
-                'question': f"True or False: {usable_sentences[i]}",
+                'question': f"True or False: {sentence.text}",
                 'correctAnswer': random.choice([True, False])
             })
             
-        elif practice_mode == 'fill-blank':
-            words = usable_sentences[i].split()
+        elif question_type == 'fill-blank':
+            words = list(sentence.words)
             if len(words) > 3:
                 replace_idx = len(words) // 2
                 answer = words[replace_idx]
@@ -716,41 +1639,13 @@ def create_basic_fallback_questions(notes_content: str, practice_mode: str, coun
                     'correctAnswer': answer
                 })
                 
-        elif practice_mode == 'short-answer':
+        else:
+            keywords = sentence.keywords
             fallback_questions.append({
                 'type': 'short-answer',
-                'question': f"Explain the concept of {extract_keywords2(usable_sentences[i])[0] if extract_keywords2(usable_sentences[i]) else 'this topic'} mentioned in the notes.",
-                'keyTerms': extract_keywords2(usable_sentences[i])
+                'question': f"Explain the concept of {keywords[0] if keywords else 'this topic'} mentioned in the notes.",
+                'keyTerms': list(keywords)
             })
-            
-        else:  # random
-            question_type = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer'][i % 4]
-            if question_type == 'multiple-choice':
-                fallback_questions.append(create_basic_mc_question(usable_sentences[i], "", extract_keywords2(usable_sentences[i])))
-            elif question_type == 'true-false':
-                fallback_questions.append({
-                    'type': 'true-false',
-                    'question': f"True or False: {usable_sentences[i]}",
-                    'correctAnswer': random.choice([True, False])
-                })
-            elif question_type == 'fill-blank':
-                words = usable_sentences[i].split()
-                if len(words) > 3:
-                    replace_idx = len(words) // 2
-                    answer = words[replace_idx]
-                    words[replace_idx] = '_____'
-                    question = ' '.join(words)
-                    fallback_questions.append({
-                        'type': 'fill-blank',
-                        'question': question,
-                        'correctAnswer': answer
-                    })
-            else:
-                fallback_questions.append({
-                    'type': 'short-answer',
-                    'question': f"Explain the concept of {extract_keywords2(usable_sentences[i])[0] if extract_keywords2(usable_sentences[i]) else 'this topic'} mentioned in the notes.",
-                    'keyTerms': extract_keywords2(usable_sentences[i])
-                })
     
     return fallback_questions
 
@@ -794,13 +1689,6 @@ def create_basic_mc_question(sentence: str, answer: str, keywords: List[str]) ->
         'correctAnswerIndex': correct_index
     }
 
-def extract_keywords2(text: str) -> List[str]: #this extraction function is for the simplified functions if the regular ones dont work
-    """Extract potential keywords from text."""
-    words = re.findall(r'\b[A-Za-z][A-Za-z-]{3,}\b', text)
-    stopwords = {'the', 'and', 'or', 'but', 'for', 'nor', 'on', 'at', 'to', 'from', 'by', 'with', 'in', 'out', 'about', 'than'}
-    keywords = [word for word in words if word.lower() not in stopwords]
-    return list(set(keywords))[:3]  #limited to top 3 keywords
-
 def extract_keywords(text: str) -> List[str]: #this is the main extraction function for the regfular question parsing function(s?)
     """Extract keywords from text."""
     common_words = {'the', 'and', 'or', 'but', 'for', 'nor', 'on', 'at', 'to', 'from', 'by', 'with', 'in', 'out', 'about', 'than','about', 'after', 'again', 'below', 'could', 'every', 'first', 'found', 'great', 
@@ -832,64 +1720,39 @@ def simulate_ai_generation(
     """Generate questions locally when API requests fail."""
     print("Starting local simulation for question generation")
     
-    time.sleep(0.8)
-    
-    concepts = extract_key_concepts(notes_content)
-    questions = []
+    labels = metric_labels(practice_mode, difficulty)
+    with tracer.span('fallback.local', count=count), stage_seconds.time(stage='local', **labels):
+        index = notes_indexes.get(notes_content)
+        questions = []
 
-    if practice_mode == 'random':
-        types = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer']
-        for _ in range(count):
-            question_type = random.choice(types)
-            questions.append(create_question(concepts, question_type, difficulty))
-    else:
-        for _ in range(count):
-            questions.append(create_question(concepts, practice_mode, difficulty))
+        if practice_mode == 'random':
+            types = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer']
+            for _ in range(count):
+                question_type = random.choice(types)
+                questions.append(create_question(index, question_type, difficulty))
+        else:
+            for _ in range(count):
+                questions.append(create_question(index, practice_mode, difficulty))
 
     print(f"Generated {len(questions)} questions locally")
+    fallback_questions.inc(len(questions), kind='local', **labels)
     return questions
 
-def extract_key_concepts(text: str) -> List[Dict[str, Union[str, int]]]:
-    """Extract key concepts from text."""
-    paragraphs = [p for p in text.split('\n\n') if len(p.strip()) > 40]
-    
-    if len(paragraphs) < 10:
-        lower_text = re.sub(r'[^\w\s.?!]', '', text.lower())
-        words = lower_text.split()
-
-        freq = {}
-        for word in words:
-            if len(word) > 3:
-                freq[word] = freq.get(word, 0) + 1
-
-        sentences = [s.strip() for s in re.split(r'[.?!]', text) if len(s.strip()) > 20]
-
-        scored = []
-        for s in sentences:
-            tokens = s.lower().split()
-            score = sum(freq.get(word, 0) for word in tokens)
-            scored.append({'text': s, 'score': score})
-
-        scored.sort(key=lambda x: x['score'], reverse=True)
-        return scored[:25]
-    else:
-        return [{'text': p, 'score': len(p)} for p in paragraphs]
-
 def create_question(
-    concepts: List[Dict[str, Any]], 
+    index: NotesIndex, 
     question_type: str, 
     difficulty: str
 ) -> Dict[str, Any]:
     """Create questions with improved variety."""
+    concepts = index.concepts
     # Select a concept with some weighting toward higher scores
     weighted_index = int(random.random() * random.random() * len(concepts))
-    concept = concepts[weighted_index] if weighted_index < len(concepts) else None
     
-    if not concept:
+    if weighted_index >= len(concepts):
         return generate_fallback_questions("", question_type, difficulty, 1)[0]
 
-    sentences = [s.strip() for s in re.split(r'[.?!]', concept['text']) if len(s.strip()) > 15]
-    sentence = random.choice(sentences) if sentences else concept['text']
+    sentences = index.concept_sentences(weighted_index)
+    sentence = random.choice(sentences) if sentences else index.sentence(concepts[weighted_index]['text'])
     
     if question_type == 'multiple-choice':
         return create_multiple_choice_question(sentence, difficulty)
@@ -902,11 +1765,11 @@ def create_question(
     else:
         return create_multiple_choice_question(sentence, difficulty)
 
-def create_multiple_choice_question(text: str, difficulty: str) -> Dict[str, Any]:
+def create_multiple_choice_question(sentence: Sentence, difficulty: str) -> Dict[str, Any]:
     """Create multiple choice questions."""
-    question = f"What is the main concept described in this text: '{text[:50]}...'?"
+    question = f"What is the main concept described in this text: '{sentence.text[:50]}...'?"
     
-    options = generate_options(text, difficulty)
+    options = generate_options(sentence, difficulty)
     
     return {
         'type': 'multiple-choice',
@@ -915,9 +1778,9 @@ def create_multiple_choice_question(text: str, difficulty: str) -> Dict[str, Any
         'correctAnswerIndex': 0  # First option is correct
     }
 
-def generate_options(text: str, difficulty: str) -> List[str]:
+def generate_options(sentence: Sentence, difficulty: str) -> List[str]:
     """Generate options for multiple choice questions."""
-    key_terms = extract_key_terms(text, difficulty)
+    key_terms = extract_key_terms(sentence, difficulty)
     
     correct_answer = key_terms[0] if key_terms else "Correct answer"
     
@@ -929,14 +1792,15 @@ def generate_options(text: str, difficulty: str) -> List[str]:
     return all_options
 
 
-def create_true_false_question(text: str) -> Dict[str, Any]:
+def create_true_false_question(sentence: Sentence) -> Dict[str, Any]:
     """Create true/false questions."""
     is_true = random.random() > 0.4  
+    text = sentence.text
     
     if is_true:
         statement = text
     else:
-        words = text.split(' ')
+        words = list(sentence.space_words)
         if len(words) > 8:
             method = random.randint(0, 2)
             
@@ -959,22 +1823,15 @@ def create_true_false_question(text: str) -> Dict[str, Any]:
         'correctAnswer': is_true
     }
 
-def create_fill_blank_question(text: str) -> Dict[str, Any]:
+def create_fill_blank_question(sentence: Sentence) -> Dict[str, Any]:
     """Create fill-in-the-blank questions."""
-    important_word_pattern = r'\b(is|are|was|were|has|have|will|should|could|must|main|key|critical|important|essential|primary|necessary|fundamental|crucial|significant)\b'
-    
-    words = text.split(' ')
-    target_index = -1
+    words = list(sentence.space_words)
+    target_index = sentence.important_word_index
     
-    for i, word in enumerate(words):
-        if len(word) > 4 and re.search(important_word_pattern, word, re.IGNORECASE):
-            target_index = i
-            break
-    
-    if target_index == -1:
-        candidates = [(word, i) for i, word in enumerate(words) if len(word) > 4]
+    if target_index is None:
+        candidates = sentence.long_word_indices
         if candidates:
-            _, target_index = random.choice(candidates)
+            target_index = random.choice(candidates)
         else:
             target_index = random.randint(0, len(words) - 1)
     
@@ -987,8 +1844,9 @@ def create_fill_blank_question(text: str) -> Dict[str, Any]:
         'correctAnswer': target
     }
 
-def create_short_answer_question(text: str, difficulty: str) -> Dict[str, Any]:
+def create_short_answer_question(sentence: Sentence, difficulty: str) -> Dict[str, Any]:
     """Create short answer questions."""
+    text = sentence.text
     try:
         question = query_hugging_face_api(text)
         if not question:
@@ -996,7 +1854,7 @@ def create_short_answer_question(text: str, difficulty: str) -> Dict[str, Any]:
     except Exception:
         question = f"Explain the following concept: {text[:50]}..."
     
-    key_terms = extract_key_terms(text, difficulty)
+    key_terms = extract_key_terms(sentence, difficulty)
     
     return {
         'type': 'short-answer',
@@ -1004,14 +1862,9 @@ def create_short_answer_question(text: str, difficulty: str) -> Dict[str, Any]:
         'keyTerms': key_terms
     }
 
-def extract_key_terms(text: str, difficulty: str) -> List[str]:
+def extract_key_terms(sentence: Sentence, difficulty: str) -> List[str]:
     """Extract key terms based on difficulty level."""
-    capitalized_terms = re.findall(r'[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*', text) or []
-
-    words = [w for w in text.split() if len(w) > 5]
-
-    combined = capitalized_terms + words
-    unique = list(set(term.lower() for term in combined))
+    unique = list(sentence.key_term_pool)
 
     count = 4 if difficulty == 'expert' else 3 if difficulty == 'intermediate' else 2
     
@@ -1046,25 +1899,83 @@ def generate_smart_distractors(correct: str, difficulty: str) -> List[str]:
 
 
     
+def top_up_questions(
+    notes_content: str, practice_mode: str, difficulty: str, count: int,
+    accepted: List[Dict[str, Any]], started: float
+) -> Tuple[List[Dict[str, Any]], int]:
+    """`count` questions to complete a short Ollama answer, and how many of them were made locally.
+
+    If the request (begun at `started`, a time.perf_counter() value) is still within
+    GENERATION_LATENCY_BUDGET, Ollama is asked for just the missing questions, shown the
+    `accepted` ones so it doesn't repeat them. Whatever that doesn't cover is made locally.
+    """
+    remaining = GENERATION_LATENCY_BUDGET - (time.perf_counter() - started)
+    labels = metric_labels(practice_mode, difficulty)
+    questions = []
+    with tracer.span('fallback.top_up', count=count, remaining_seconds=round(remaining, 1)) as span:
+        if remaining < TOP_UP_MIN_SECONDS:
+            print(f"{remaining:.1f}s left of the latency budget, topping up locally")
+        elif ollama_breaker.state == 'open':
+            print("Ollama circuit is open, topping up locally")
+        else:
+            try:
+                questions = ollama_top_up(notes_content, practice_mode, difficulty, count, accepted, remaining)
+            except Exception as error:
+                print(f"Ollama top-up failed: {error}")
+                span.set(ollama_error=f"{type(error).__name__}: {error}")
+        top_up_questions_total.inc(len(questions), source='ollama', **labels)
+
+        missing = count - len(questions)
+        if missing > 0:
+            with stage_seconds.time(stage='fallback', **labels):
+                local = generate_fallback_questions(notes_content, practice_mode, difficulty, missing)
+            fallback_questions.inc(len(local), kind='top_up', **labels)
+            top_up_questions_total.inc(len(local), source='local', **labels)
+            questions.extend(local)
+        span.set(from_ollama=count - missing, from_local=max(0, missing))
+    return questions, max(0, missing)
+
+
+def ollama_top_up(
+    notes_content: str, practice_mode: str, difficulty: str, count: int,
+    accepted: List[Dict[str, Any]], deadline: float
+) -> List[Dict[str, Any]]:
+    """Ask Ollama for `count` more questions within `deadline` seconds, dropping repeats of `accepted`."""
+    seen = {question_fingerprint(question) for question in accepted}
+    questions = []
+    with closing(stream_chunk_with_ollama(notes_content, practice_mode, difficulty, count, accepted, deadline)) as stream:
+        for question in stream:
+            fingerprint = question_fingerprint(question)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            questions.append(question)
+            if len(questions) >= count:
+                break
+    print(f"Topped up {len(questions)} of {count} questions from Ollama")
+    return questions
+
+
+def question_fingerprint(question: Dict[str, Any]) -> str:
+    """The question text without case or punctuation, to spot the same question asked twice."""
+    return re.sub(r'\W+', ' ', question['question'].lower()).strip()
+
+
 def generate_fallback_questions(notes_content: str, practice_mode: str, difficulty: str, count: int) -> List[Dict[str, Any]]:
     """Generate higher-quality fallback questions based on the actual notes content."""
     print(f"Generating {count} fallback questions for {practice_mode} mode")
     
-    #extracting key sentences from the notes
-    sentences = []
-    for paragraph in notes_content.split('\n\n'):
-        if len(paragraph.strip()) < 30 or '@app.' in paragraph or 'def ' in paragraph:
-            continue
-            
-        paragraph_sentences = re.split(r'[.!?]', paragraph)
-        sentences.extend([s.strip() for s in paragraph_sentences if len(s.strip()) > 20])
+    #key sentences from the notes
+    sentences = notes_indexes.get(notes_content).fallback_sentences
     
     if not sentences:
         return [create_generic_fallback_question(practice_mode) for _ in range(count)]
     
+    #each sentence once (in random order) before any is used again; only draw as many as are needed
+    order = random.sample(sentences, min(count, len(sentences)))
     questions = []
-    for _ in range(count):
-        sentence = random.choice(sentences) if sentences else ""
+    for i in range(count):
+        sentence = order[i % len(order)]
         
         if practice_mode == 'multiple-choice':
             questions.append(create_smarter_multiple_choice(sentence, difficulty))
@@ -1090,9 +2001,9 @@ def generate_fallback_questions(notes_content: str, practice_mode: str, difficul
     return questions
 
 
-def create_smarter_multiple_choice(sentence: str, difficulty: str) -> Dict[str, Any]:
+def create_smarter_multiple_choice(sentence: Sentence, difficulty: str) -> Dict[str, Any]:
     """Create a better multiple choice question based on a sentence."""
-    words = sentence.split()
+    words = sentence.words
     
     if len(words) > 10:
         start_idx = random.randint(0, len(words) - 5)
@@ -1105,7 +2016,7 @@ def create_smarter_multiple_choice(sentence: str, difficulty: str) -> Dict[str,
         else:
             correct_answer = "the end of the text"
     else:
-        question = f"Which statement best describes the following: '{sentence}'?"
+        question = f"Which statement best describes the following: '{sentence.text}'?"
         correct_answer = "This statement is accurate"
     
     if difficulty == 'beginner':
@@ -1117,7 +2028,7 @@ def create_smarter_multiple_choice(sentence: str, difficulty: str) -> Dict[str,
     elif difficulty == 'intermediate':
         distractors = [
             f"The opposite is true: {' '.join([w for w in reversed(words[:10])])}",
-            f"A different approach is described: {sentence.replace('is', 'is not')}",
+            f"A different approach is described: {sentence.text.replace('is', 'is not')}",
             "This statement relates to a different topic"
         ]
     else:  #expert
@@ -1138,14 +2049,15 @@ def create_smarter_multiple_choice(sentence: str, difficulty: str) -> Dict[str,
         'correctAnswerIndex': correct_answer_index
     }
 
-def create_smarter_true_false(sentence: str) -> Dict[str, Any]:
+def create_smarter_true_false(sentence: Sentence) -> Dict[str, Any]:
     """Create a better true/false question based on a sentence."""
     is_true = random.random() > 0.3  #bias toward true statements
+    text = sentence.text
     
     if is_true:
-        question = f"True or False: {sentence}"
+        question = f"True or False: {text}"
     else:
-        words = sentence.split()
+        words = list(sentence.words)
         if len(words) > 5:
             method = random.randint(0, 2)
             
@@ -1164,11 +2076,11 @@ def create_smarter_true_false(sentence: str) -> Dict[str, Any]:
                     words[mid], words[mid-1] = words[mid-1], words[mid]
                     question = f"True or False: {' '.join(words)}"
                 else:
-                    question = f"True or False: The opposite of '{sentence}' is correct"
+                    question = f"True or False: The opposite of '{text}' is correct"
             else:
-                question = f"True or False: {sentence}, which is never the case"
+                question = f"True or False: {text}, which is never the case"
         else:
-            question = f"True or False: The opposite of '{sentence}' is correct"
+            question = f"True or False: The opposite of '{text}' is correct"
     
     return {
         'type': 'true-false',
@@ -1176,19 +2088,10 @@ def create_smarter_true_false(sentence: str) -> Dict[str, Any]:
         'correctAnswer': is_true
     }
 
-def create_smarter_fill_blank(sentence: str) -> Dict[str, Any]:
+def create_smarter_fill_blank(sentence: Sentence) -> Dict[str, Any]:
     """Create a better fill-in-the-blank question based on a sentence."""
-    words = sentence.split()
-    
-    common_words = {'about', 'after', 'again', 'below', 'could', 'every', 'first', 'found', 'great', 
-                    'house', 'large', 'learn', 'never', 'other', 'place', 'small', 'study', 'think', 
-                    'where', 'which', 'world', 'would', 'write', 'their', 'there', 'these', 'those'}
-    
-    candidate_indices = [i for i, word in enumerate(words) 
-                        if len(word) > 4 and word.lower() not in common_words]
-    
-    if not candidate_indices:
-        candidate_indices = [i for i, word in enumerate(words) if len(word) > 3]
+    words = list(sentence.words)
+    candidate_indices = sentence.blank_candidates
     
     if candidate_indices:
         target_idx = random.choice(candidate_indices)
@@ -1205,26 +2108,16 @@ def create_smarter_fill_blank(sentence: str) -> Dict[str, Any]:
         'correctAnswer': correct_answer
     }
 
-def create_smarter_short_answer(sentence: str, difficulty: str) -> Dict[str, Any]:
+def create_smarter_short_answer(sentence: Sentence, difficulty: str) -> Dict[str, Any]:
     """Create a better short-answer question based on a sentence."""
-    if len(sentence) > 50:
-        question = f"Explain the meaning and implications of: '{sentence}'"
+    if len(sentence.text) > 50:
+        question = f"Explain the meaning and implications of: '{sentence.text}'"
     else:
-        question = f"Describe the concept mentioned in: '{sentence}'"
-    
-    key_terms = []
-    words = [w for w in re.sub(r'[^\w\s]', '', sentence.lower()).split() if len(w) > 4]
-    
-    common_words = {'about', 'after', 'again', 'below', 'could', 'every', 'first', 'found', 'great', 
-                    'house', 'large', 'learn', 'never', 'other', 'place', 'small', 'study', 'think', 
-                    'where', 'which', 'world', 'would', 'write', 'their', 'there', 'these', 'those'}
-                    
-    unique_words = list(set(w for w in words if w not in common_words))
+        question = f"Describe the concept mentioned in: '{sentence.text}'"
     
     num_terms = 5 if difficulty == 'expert' else 4 if difficulty == 'intermediate' else 3
     
-    unique_words.sort(key=len, reverse=True)
-    key_terms = unique_words[:num_terms]
+    key_terms = sentence.ranked_terms[:num_terms]
     
     if len(key_terms) < num_terms:
         generic_terms = ['concept', 'analysis', 'process', 'function', 'implementation']
@@ -1287,7 +2180,18 @@ def create_generic_fallback_question(question_type: str) -> Dict[str, Any]:
             'correctAnswerIndex': 0
         }
     
+def start_background_tasks():
+    """Threads the app runs beside requests; started per process (gunicorn forks after loading the app)."""
+    if MODEL_WARMUP:
+        for warmer in model_warmers.values():
+            warmer.start()
+    if len(ollama_client.backends) > 1:
+        ollama_client.start_health_checks()
+
+
 if __name__ == '__main__':
+    #flask's development server, for local use; in production run gunicorn -c gunicorn.conf.py app:app
     port = int(os.environ.get('PORT', 5001))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    start_background_tasks()
+    app.run(host='0.0.0.0', port=port, threaded=True)
         
\ No newline at end of file
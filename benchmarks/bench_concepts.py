@@ -0,0 +1,96 @@
+"""Time concept scoring on notes from a paragraph up to 1 MB.
+
+Compares concept_scoring (NumPy TF-IDF) with the old extract_key_concepts and with the
+same TF-IDF scoring written as plain Python loops, and checks the two TF-IDF versions
+agree.
+
+    python benchmarks/bench_concepts.py
+"""
+import math
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import concept_scoring
+import legacy_concepts
+from corpus import make_notes
+
+
+def python_tfidf(sentences, positions):
+    """concept_scoring.score_sentences with dicts and loops instead of arrays."""
+    vocabulary = {}
+    rows = []
+    for sentence in sentences:
+        counts = {}
+        for word in re.findall(r"[a-z0-9][a-z0-9'-]*", sentence.lower()):
+            if len(word) > 3:
+                term = vocabulary.setdefault(word, len(vocabulary))
+                counts[term] = counts.get(term, 0) + 1
+        rows.append(counts)
+
+    n = len(sentences)
+    df = {}
+    for counts in rows:
+        for term in counts:
+            df[term] = df.get(term, 0) + 1
+    idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+    vectors = [{term: (1 + math.log(count)) * idf[term] for term, count in counts.items()} for counts in rows]
+
+    centroid = {}
+    for vector in vectors:
+        for term, weight in vector.items():
+            centroid[term] = centroid.get(term, 0) + weight / n
+    centroid_norm = math.sqrt(sum(w * w for w in centroid.values()))
+
+    scores = []
+    for vector, position in zip(vectors, positions):
+        norm = math.sqrt(sum(w * w for w in vector.values())) * centroid_norm
+        similarity = sum(w * centroid[t] for t, w in vector.items()) / norm if norm else 0.0
+        scores.append(similarity * (1 + concept_scoring.POSITION_WEIGHT * (1 - position)))
+    return scores
+
+
+def time_call(fn, *args, repeat=1, runs=7):
+    """Median over `runs` of the mean time of `repeat` calls; one run of a 1 MB case is mostly GC and cache noise."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(*args)
+        times.append((time.perf_counter() - start) / repeat)
+    return statistics.median(times)
+
+
+def check_parity(text):
+    sentences, positions = concept_scoring.split_sentences(text)
+    expected = python_tfidf(sentences, positions)
+    actual = concept_scoring.score_sentences(sentences, positions)
+    worst = max(abs(a - b) for a, b in zip(actual, expected))
+    print(f"Parity: NumPy and pure Python TF-IDF scores differ by at most {worst:.2e} over {len(sentences)} sentences")
+    return worst < 1e-9
+
+
+def bench():
+    print(f"\n  {'notes':>9}{'sentences':>11}{'old (ms)':>11}{'old sent. (ms)':>16}{'python tfidf':>14}{'numpy tfidf':>13}")
+    for size in (2_000, 20_000, 200_000, 1_000_000):
+        text = make_notes(size)
+        sentences, positions = concept_scoring.split_sentences(text)
+        repeat = max(1, 200_000 // size)
+        old = time_call(legacy_concepts.extract_key_concepts, text, repeat=repeat)
+        old_sentences = time_call(legacy_concepts.score_by_frequency, text, repeat=repeat)
+        python = time_call(lambda: python_tfidf(*concept_scoring.split_sentences(text)), repeat=repeat)
+        numpy = time_call(concept_scoring.score_concepts, text, repeat=repeat)
+        print(f"  {len(text):>9,}{len(sentences):>11,}{old * 1000:>11.1f}{old_sentences * 1000:>16.1f}"
+              f"{python * 1000:>14.1f}{numpy * 1000:>13.1f}")
+    print("\n  old: extract_key_concepts as it was (paragraph length as the score once there are 10+ paragraphs)")
+    print("  old sent.: its frequency-sum sentence scoring forced on every size")
+
+
+if __name__ == '__main__':
+    ok = check_parity(make_notes(200_000))
+    bench()
+    sys.exit(0 if ok else 1)
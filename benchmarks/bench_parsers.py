@@ -0,0 +1,80 @@
+"""Compare question_parser with the old regex parsers.
+
+Checks both give the same questions on the corpus, then times them on real-looking
+output and on adversarial output of growing size.
+
+    python benchmarks/bench_parsers.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import question_parser
+import legacy_parsers
+from corpus import REAL_OUTPUTS, adversarial_outputs
+
+#stop growing an adversarial input once the old parser takes longer than this on it
+LEGACY_TIME_LIMIT = 1.0
+
+
+def parse_all(parser, text):
+    """Everything a parser module can pull out of one output."""
+    pairs = parser.split_qa_pairs(text)
+    return {
+        'blocks': parser.parse_questions(text, 1000) if parser is legacy_parsers else parser.parse_blocks(text, 1000),
+        'pairs': pairs,
+        'options': [parser.split_options(q) for q, _ in pairs] + [parser.split_options(text)],
+    }
+
+
+def time_call(fn, *args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def check_parity():
+    texts = dict(REAL_OUTPUTS)
+    texts.update({f"{name} (small)": text for name, text in adversarial_outputs(6).items()})
+
+    mismatches = 0
+    for name, text in texts.items():
+        for variant, sample in (('', text), (' crlf', text.replace('\n', '\r\n'))):
+            if parse_all(question_parser, sample) != parse_all(legacy_parsers, sample):
+                print(f"  MISMATCH: {name}{variant}")
+                mismatches += 1
+    print(f"Parity: {len(texts) * 2 - mismatches}/{len(texts) * 2} outputs parse the same")
+    return mismatches == 0
+
+
+def bench_real():
+    print("\nReal outputs (ops/sec, higher is better)")
+    print(f"  {'output':<18}{'regex':>12}{'linear':>12}{'speedup':>10}")
+    for name, text in REAL_OUTPUTS.items():
+        old = time_call(parse_all, legacy_parsers, text, repeat=2000)
+        new = time_call(parse_all, question_parser, text, repeat=2000)
+        print(f"  {name:<18}{1 / old:>12,.0f}{1 / new:>12,.0f}{old / new:>9.1f}x")
+
+
+def bench_adversarial():
+    print("\nAdversarial outputs (ms per parse)")
+    print(f"  {'output':<28}{'size':>6}{'chars':>9}{'regex':>12}{'linear':>10}")
+    for name in adversarial_outputs(1):
+        for size in (10, 20, 40, 80, 160, 320):
+            text = adversarial_outputs(size)[name]
+            old = time_call(parse_all, legacy_parsers, text)
+            new = time_call(parse_all, question_parser, text)
+            print(f"  {name:<28}{size:>6}{len(text):>9}{old * 1000:>12.1f}{new * 1000:>10.2f}")
+            if old > LEGACY_TIME_LIMIT:
+                print(f"  {'':<28}(regex parser too slow to go further)")
+                break
+
+
+if __name__ == '__main__':
+    ok = check_parity()
+    bench_real()
+    bench_adversarial()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,161 @@
+"""Micro-benchmarks for the parsing and local generation hot paths.
+
+Runs every case on fixed inputs (recorded model output for each practice mode, generated
+notes of three sizes, fixed random seeds) and reports ops/sec, latency percentiles and
+peak memory. Nothing talks to Ollama, so it runs offline.
+
+    python benchmarks/bench_suite.py                          # run and print
+    python benchmarks/bench_suite.py --save baseline.json     # keep the results
+    python benchmarks/bench_suite.py --compare baseline.json  # flag regressions, exit 1 if any
+    python benchmarks/bench_suite.py --filter fallback --time 0.5
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from corpus import NOTES, REAL_OUTPUTS
+from notes_index import NotesIndex
+
+#a case regresses when it gets this much slower (ops/sec, p95) or hungrier (peak memory) than the baseline
+DEFAULT_THRESHOLD = 0.15
+#and p95 only counts once it's this much slower too; on sub-0.1 ms cases the threshold alone is scheduler noise
+DEFAULT_MIN_P95_DELTA_MS = 0.05
+
+SEED = 1234
+
+
+def build_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    cases = []
+    for mode, output in REAL_OUTPUTS.items():
+        count = 10
+        cases.append((f"parse_questions/{mode}", lambda o=output, m=mode: app.parse_questions(o, m, count)))
+        cases.append((f"parse_simplified_questions/{mode}", lambda o=output, m=mode: app.parse_simplified_questions(o, m, count)))
+
+    for size, notes in NOTES.items():
+        #a fresh index each time, so this is the full analysis rather than a cache hit
+        cases.append((f"extract_key_concepts/{size}", lambda n=notes: NotesIndex(n).concepts))
+        cases.append((f"generate_fallback_questions/{size}",
+                      lambda n=notes: app.generate_fallback_questions(n, 'random', 'intermediate', 20)))
+        cases.append((f"simulate_ai_generation/{size}",
+                      lambda n=notes: app.simulate_ai_generation(n, 'random', 'intermediate', 20)))
+    return cases
+
+
+def run_case(fn: Callable[[], Any], min_time: float, min_runs: int = 5) -> Dict[str, float]:
+    """Time `fn` over and over for at least `min_time` seconds, then measure its peak memory once."""
+    random.seed(SEED)
+    fn()  #warm up (and fill any per-document caches, as a running server would have)
+
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_runs or time.perf_counter() - started < min_time:
+        random.seed(SEED + len(latencies))
+        op_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - op_started)
+    total = sum(latencies)
+
+    random.seed(SEED)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "runs": len(latencies),
+        "ops_per_sec": len(latencies) / total,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_kb": peak / 1024,
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float,
+            min_p95_delta_ms: float = DEFAULT_MIN_P95_DELTA_MS) -> List[str]:
+    """Human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: {before['ops_per_sec']:,.0f} -> {result['ops_per_sec']:,.0f} ops/sec")
+        if result["p95_ms"] > max(before["p95_ms"] * (1 + threshold), before["p95_ms"] + min_p95_delta_ms):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.3f} -> {result['p95_ms']:.3f} ms")
+        if result["peak_kb"] > before["peak_kb"] * (1 + threshold) + 1:
+            regressions.append(f"{name}: peak memory {before['peak_kb']:,.0f} -> {result['peak_kb']:,.0f} KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help="only run cases whose name contains this")
+    parser.add_argument('--time', type=float, default=1.0, help="seconds to spend on each case")
+    parser.add_argument('--save', metavar='FILE', help="write the results to a JSON baseline")
+    parser.add_argument('--compare', metavar='FILE', help="compare against a JSON baseline and flag regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.15 for 15%%")
+    parser.add_argument('--min-p95-delta-ms', type=float, default=DEFAULT_MIN_P95_DELTA_MS,
+                        help="smallest p95 increase that counts as a regression, whatever the percentage")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    print(f"  {'case':<42}{'ops/sec':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KB':>10}{'vs base':>9}")
+    results = {}
+    for name, fn in build_cases():
+        if args.filter not in name:
+            continue
+        #the app logs with print; keep that out of the table and the timings' way
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_case(fn, args.time)
+        results[name] = result
+
+        change = ''
+        if name in baseline:
+            change = f"{result['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1:+.0%}"
+        print(f"  {name:<42}{result['ops_per_sec']:>11,.0f}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{result['peak_kb']:>10,.0f}{change:>9}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved {len(results)} results to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold, args.min_p95_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
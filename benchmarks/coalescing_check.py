@@ -0,0 +1,101 @@
+"""Check that identical requests to the two generation endpoints can share one Ollama call.
+
+A request joins an identical one already generating whatever endpoint either came in on,
+so the streaming and the non-streaming leaders have to publish the same result. For each
+pairing this starts the leader, sends the identical request to the other endpoint while
+the leader is still generating, and checks the waiter got the leader's questions in its
+own response format. Exits 1 if any pairing fails.
+
+Ollama has to be slow enough for the two to overlap:
+
+    python benchmarks/fake_ollama.py --tokens-per-sec 15 &
+    OLLAMA_API_URL=http://127.0.0.1:11435 python app.py &
+    python benchmarks/coalescing_check.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_notes
+
+
+def generate(url: str, payload: Dict[str, Any]) -> Tuple[List[Any], str]:
+    """The questions from /api/generate-questions and its source."""
+    body = requests.post(f"{url}/api/generate-questions", json=payload, timeout=300).json()
+    return body.get("questions", []), body.get("source", '')
+
+
+def stream(url: str, payload: Dict[str, Any]) -> Tuple[List[Any], str]:
+    """The questions from /api/generate-questions/stream; the source isn't reported there."""
+    questions = []
+    with requests.post(f"{url}/api/generate-questions/stream", json=payload, stream=True, timeout=300) as response:
+        for line in response.iter_lines():
+            if line:
+                message = json.loads(line)
+                if "question" in message:
+                    questions.append(message["question"])
+    return questions, ''
+
+
+def well_formed(questions: List[Any], count: int) -> bool:
+    return len(questions) == count and all(
+        isinstance(question, dict) and isinstance(question.get("question"), str) and question.get("type")
+        for question in questions
+    )
+
+
+def check(url: str, leader, waiter, payload: Dict[str, Any], delay: float) -> List[str]:
+    """Problems with a `waiter` request that joins an identical `leader` request."""
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(leader=leader(url, payload)))
+    thread.start()
+    time.sleep(delay)
+    questions, source = waiter(url, payload)
+    thread.join()
+
+    problems = []
+    if not well_formed(questions, payload["count"]):
+        problems.append(f"waiter got malformed questions: {json.dumps(questions)[:200]}")
+    if source and source != 'shared':
+        problems.append(f"waiter's source is {source!r}, not 'shared'")
+    if questions != results["leader"][0]:
+        problems.append("waiter's questions differ from the leader's")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--count', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.5, help="seconds between the leader and the waiter")
+    args = parser.parse_args()
+
+    pairings = [("stream joins generate", generate, stream), ("generate joins stream", stream, generate)]
+    failed = 0
+    for name, leader, waiter in pairings:
+        payload = {
+            "notesContent": make_notes(1500, seed=random.randrange(1 << 30)),  #new notes, so nothing is cached
+            "practiceMode": 'multiple-choice',
+            "difficultyLevel": 'intermediate',
+            "count": args.count,
+        }
+        problems = check(args.url, leader, waiter, payload, args.delay)
+        print(f"  {name:<24}{'ok' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"    {problem}")
+        failed += bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
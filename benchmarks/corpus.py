@@ -0,0 +1,180 @@
+"""Model outputs used by the benchmarks.
+
+REAL_OUTPUTS are shaped like what llama3.2 actually returns for the app's prompt formats
+(including its usual quirks: bold headers, blank lines, answers on the next line, chatty
+"Answer: The correct answer is ..." lines). adversarial_outputs builds malformed output
+that makes lazy regexes backtrack. make_notes builds study notes of any size from a fixed
+seed, and NOTES has the small / medium / textbook sizes the suite uses.
+"""
+import random
+from typing import Dict
+
+RANDOM_OUTPUT = """Here are 6 mixed questions based on the notes:
+
+**Multiple Choice Question**
+Question: What is the primary function of chlorophyll in photosynthesis?
+A) To absorb water from the soil
+B) To absorb light energy
+C) To release oxygen into the air
+D) To store glucose
+Answer: B
+===
+**True/False Question**
+Question: The Calvin cycle takes place in the thylakoid membranes.
+Answer: False
+===
+**Fill-in-the-Blank Question**
+Question: The light-dependent reactions produce ATP and _____.
+Answer: NADPH
+===
+**Short Answer Question**
+Question: Explain how the light-dependent and light-independent reactions are connected.
+Key Terms: ATP, NADPH, Calvin cycle, energy transfer
+===
+**Multiple Choice Question**
+Question: Which gas is released as a by-product of photosynthesis?
+A) Carbon dioxide
+B) Nitrogen
+C) Oxygen
+D) Hydrogen
+
+Answer:
+C
+===
+**True or False Question**
+Question: True or False: Plants can photosynthesize without light.
+Answer: false
+===
+"""
+
+MULTIPLE_CHOICE_OUTPUT = """Question: What organelle is known as the powerhouse of the cell?
+A) Nucleus
+B) Mitochondria
+C) Ribosome
+D) Golgi apparatus
+Answer: B
+
+Question: Which molecule carries genetic information?
+A) ATP
+B) Glucose
+C) DNA
+D) Lipid
+Answer: C
+
+Question: What process do cells use to divide into two identical cells?
+A. Meiosis
+B. Mitosis
+C. Osmosis
+D. Diffusion
+Answer: The correct answer is B) Mitosis
+
+Question: Which structure controls what enters and leaves the cell?
+A) Cell wall
+B) Cytoplasm
+C) Cell membrane
+D) Vacuole
+Answer: C
+"""
+
+TRUE_FALSE_OUTPUT = """Question: True or False: The French Revolution began in 1789.
+Answer: True
+
+Question: Napoleon Bonaparte was crowned emperor in 1815.
+Answer: False
+
+Question: True or False: The storming of the Bastille happened on July 14.
+Answer: True
+
+Question: The Reign of Terror ended with the execution of Robespierre.
+Answer: True
+"""
+
+FILL_BLANK_OUTPUT = """Question: The process by which water changes from liquid to gas is called _____.
+Answer: evaporation
+
+Question: Clouds form when water vapor _____ into tiny droplets.
+Answer: condenses
+
+Question: Water that soaks into the ground becomes _____ water.
+Answer: groundwater
+
+Question: The sun provides the _____ that drives the water cycle.
+Answer: energy
+"""
+
+SHORT_ANSWER_OUTPUT = """Question: Explain why supply and demand determine market prices.
+Answer: Prices move toward the point where the quantity supplied equals the quantity demanded.
+Key Terms: equilibrium, supply, demand, price
+
+Question: Describe what happens to demand when the price of a substitute good rises.
+Answer: Demand for the original good increases because it becomes relatively cheaper.
+Key Terms: substitute, demand curve, relative price
+
+Question: What is an externality? Give an example.
+Answer: A cost or benefit that affects third parties, such as pollution from a factory.
+Key Terms: externality, third party, market failure
+"""
+
+REAL_OUTPUTS: Dict[str, str] = {
+    'random': RANDOM_OUTPUT,
+    'multiple-choice': MULTIPLE_CHOICE_OUTPUT,
+    'true-false': TRUE_FALSE_OUTPUT,
+    'fill-blank': FILL_BLANK_OUTPUT,
+    'short-answer': SHORT_ANSWER_OUTPUT,
+}
+
+
+def adversarial_outputs(size: int) -> Dict[str, str]:
+    """Malformed outputs that grow with `size`; each one is a worst case for one of the old regexes."""
+    options = "A) first option\nB) second option\nC) third option\nD) fourth option\n"
+    return {
+        #options over and over with no Answer: line, so every A-D combination gets tried
+        'mc_without_answer': "**Multiple Choice Question**\nQuestion: Which is right?\n" + options * size,
+        #chatty answers the old regex can't use, forcing it to extend D) and keep looking
+        'mc_chatty_answers': "**Multiple Choice Question**\nQuestion: Which is right?\n"
+                             + (options + "Answer: I think it is the second one\n") * size,
+        #a model that forgot the Answer: line in every short-answer block header
+        'short_answer_without_terms': "**Short Answer Question**\n" + "Question: Explain the idea.\n" * size,
+        #lots of Question: markers and no Answer:, for the simplified parser
+        'questions_without_answers': "Question: What is this?\n" * size,
+        #A) B) C) again and again but never a D)
+        'options_without_d': "Which one? " + "A) yes B) no C) maybe " * size,
+        #one enormous block of rambling with no markers at all
+        'rambling': "**Multiple Choice Question**\n" + "The model keeps talking about the topic. " * size * 20,
+    }
+
+
+TOPICS = {
+    'biology': "cell membrane mitochondria nucleus ribosome protein enzyme photosynthesis chlorophyll glucose "
+               "respiration osmosis diffusion chromosome mitosis meiosis organism tissue",
+    'history': "revolution monarchy parliament treaty empire colony republic constitution dynasty rebellion "
+               "industrial reform alliance independence",
+    'economics': "market supply demand price inflation interest equilibrium competition monopoly externality "
+                 "taxation budget currency trade tariff",
+}
+FILLER = "the a of and to in is that which by with from this these also often because when"
+
+
+def make_notes(size: int, seed: int = 7) -> str:
+    """Deterministic paragraphs of topic sentences, about `size` characters long."""
+    rng = random.Random(seed)
+    topics = {name: words.split() for name, words in TOPICS.items()}
+    filler = FILLER.split()
+    paragraphs = []
+    length = 0
+    while length < size:
+        words = topics[rng.choice(list(topics))]
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            sentence = [rng.choice(words) if rng.random() < 0.4 else rng.choice(filler) for _ in range(rng.randint(8, 24))]
+            sentences.append(' '.join(sentence).capitalize() + '.')
+        paragraphs.append(' '.join(sentences))
+        length += len(paragraphs[-1]) + 2
+    return '\n\n'.join(paragraphs)
+
+
+NOTES: Dict[str, str] = {
+    'small': make_notes(2_000),  #a page of notes
+    'medium': make_notes(50_000),  #a chapter
+    'textbook': make_notes(1_000_000),
+}
@@ -0,0 +1,354 @@
+"""A stand-in for Ollama's /api/generate and /api/chat, for load testing without a GPU.
+
+Answers in the format the app's prompts ask for (mode and count are read from the prompt),
+with terms taken from the notes so questions differ per request. Timing is configurable:
+time to first token, prompt processing and decoding speed, and how many requests it
+serves at once (the rest wait, like Ollama with OLLAMA_NUM_PARALLEL). Like Ollama, each
+slot remembers its last prompt and only processes the part of a new prompt that doesn't
+share a prefix with it. The model is loaded on first use (--load-seconds) and unloaded
+after the request's keep_alive, with loaded models listed on /api/ps; a request with no
+prompt just loads it. It can also fail or stall a share of requests. Streams NDJSON
+like Ollama, or answers in one response with "stream": false.
+
+    python benchmarks/fake_ollama.py --port 11435 --ttft 0.3 --tokens-per-sec 40 --parallel 4
+    OLLAMA_API_URL=http://127.0.0.1:11435 python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+MODES = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer']
+
+HEADERS = {
+    'multiple-choice': "**Multiple Choice Question**",
+    'true-false': "**True/False Question**",
+    'fill-blank': "**Fill-in-the-Blank Question**",
+    'short-answer': "**Short Answer Question**",
+}
+
+FALLBACK_TERMS = ["photosynthesis", "chlorophyll", "glucose", "respiration", "mitochondria", "enzyme", "membrane"]
+
+
+def question_fields(mode: str, terms: List[str], rng: random.Random) -> Dict[str, Any]:
+    a, b, c, d = rng.sample(terms, 4) if len(terms) >= 4 else [rng.choice(terms) for _ in range(4)]
+    if mode == 'multiple-choice':
+        return {"type": mode, "question": f"Which of these is most closely linked to {a} in the notes?",
+                "options": [b, f"{a} and {c}", d, "none of the above"], "correctAnswerIndex": 1}
+    if mode == 'true-false':
+        return {"type": mode, "question": f"{a.capitalize()} depends on {b} according to the notes.",
+                "correctAnswer": rng.choice([True, False])}
+    if mode == 'fill-blank':
+        return {"type": mode, "question": f"The notes describe how _____ affects {b}.", "correctAnswer": a}
+    return {"type": mode, "question": f"Explain the relationship between {a} and {b}.", "keyTerms": [a, b, c]}
+
+
+def render_question(fields: Dict[str, Any]) -> str:
+    mode = fields["type"]
+    if mode == 'multiple-choice':
+        options = ''.join(f"{letter}) {option}\n" for letter, option in zip('ABCD', fields["options"]))
+        return f"Question: {fields['question']}\n{options}Answer: {'ABCD'[fields['correctAnswerIndex']]}"
+    if mode == 'true-false':
+        return f"Question: {fields['question']}\nAnswer: {fields['correctAnswer']}"
+    if mode == 'fill-blank':
+        return f"Question: {fields['question']}\nAnswer: {fields['correctAnswer']}"
+    return f"Question: {fields['question']}\nKey Terms: {', '.join(fields['keyTerms'])}"
+
+
+def malform(block: str, rng: random.Random) -> str:
+    """A block the way small models get it wrong now and then: no answer line, or options run together."""
+    if rng.random() < 0.5:
+        return block.rsplit('\n', 1)[0]
+    return block.replace('\n', ' ')
+
+
+def render_output(instructions: str, notes: str, rng: random.Random, output_format: Any = None,
+                  malformed_rate: float = 0.0) -> str:
+    """Model output for the app's prompts, in the ===-separated format they ask for.
+
+    With a `format` (a JSON schema) the answer is {"questions": [...]} instead; like Ollama's
+    constrained decoding, it's always valid, so malformed_rate only affects text answers.
+    """
+    #a top-up asks for "N more" questions, of one kind or of several listed after it
+    match = re.search(r'Generate EXACTLY (\d+) (?:more )?(multiple choice|true/false|fill-in-the-blank|short-answer|mixed)?', instructions)
+    count = int(match.group(1)) if match else 5
+    kind = (match.group(2) if match else None) or 'mixed'
+    mode = {'multiple choice': 'multiple-choice', 'true/false': 'true-false',
+            'fill-in-the-blank': 'fill-blank', 'short-answer': 'short-answer'}.get(kind, 'random')
+    terms = sorted(set(word.lower() for word in re.findall(r'[A-Za-z]{6,}', notes))) or FALLBACK_TERMS
+
+    questions = [question_fields(rng.choice(MODES) if mode == 'random' else mode, terms, rng) for _ in range(count)]
+    if output_format:
+        return json.dumps({"questions": questions})
+
+    blocks = []
+    for fields in questions:
+        block = f"{HEADERS[fields['type']]}\n{render_question(fields)}"
+        blocks.append(malform(block, rng) if rng.random() < malformed_rate else block)
+    return f"Here are {count} questions based on the notes:\n\n" + "\n===\n".join(blocks) + "\n===\n"
+
+
+def split_prompt(body: Dict[str, Any]):
+    """(text the model would process, instructions, notes) for a /api/generate or /api/chat body."""
+    if 'messages' in body:
+        #roughly what a chat template renders: one block per message, system first
+        prompt = ''.join(f"<|{m.get('role')}|>\n{m.get('content', '')}\n" for m in body['messages'])
+        user = next((m.get('content', '') for m in reversed(body['messages']) if m.get('role') == 'user'), '')
+        #the app's user message is "Notes:" + the notes, then the request
+        notes, _, request = user.partition('\n\nGenerate EXACTLY')
+        return prompt, 'Generate EXACTLY' + request, notes
+    prompt = body.get('prompt', '')
+    #a single prompt has the notes between this line and a run of blank lines
+    notes = prompt.split('based on these notes:', 1)[-1].split('\n\n\n', 1)[0]
+    return prompt, prompt, notes
+
+
+def keep_alive_seconds(value: Any) -> float:
+    """Seconds for a keep_alive like "30m" or 300 (Ollama's default is 5m, negative keeps it forever)."""
+    if value is None or value == '':
+        return 300.0
+    text = str(value).strip()
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    unit = next((u for u in ('ms', 'h', 'm', 's') if text.endswith(u)), '')
+    seconds = float(text[:len(text) - len(unit)]) * units.get(unit, 1)
+    return float('inf') if seconds < 0 else seconds
+
+
+def common_prefix(a: str, b: str) -> int:
+    size = min(len(a), len(b))
+    if a[:size] == b[:size]:
+        return size
+    low, high = 0, size
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def tokenize(text: str) -> List[str]:
+    """Roughly llama-sized pieces: up to 4 characters, keeping the whitespace in front."""
+    return re.findall(r'\s*[^\s]{1,4}|\s+', text)
+
+
+class FakeOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, ttft: float, tokens_per_sec: float, parallel: int,
+                 error_rate: float, stall_rate: float, stall_seconds: float, seed: int,
+                 prompt_tokens_per_sec: float = 800, load_seconds: float = 0.0, malformed_rate: float = 0.0):
+        super().__init__(address, Handler)
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.load_seconds = load_seconds
+        self.malformed_rate = malformed_rate
+        #when the model unloads (0: not loaded); the lock is held while loading, so requests wait for one load
+        self.loaded_until = 0.0
+        self.load_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.counts = {"requests": 0, "errors": 0, "stalls": 0, "loads": 0, "tokens": 0, "prompt_tokens": 0, "prompt_tokens_cached": 0}
+        self.counts_lock = threading.Lock()
+        #the prompt each slot last processed, most recently used last
+        self.slot_prompts: List[str] = [''] * parallel
+        self.slot_lock = threading.Lock()
+
+    def claim_slot_cache(self, prompt: str) -> int:
+        """Characters of `prompt` already processed: the longest prefix shared with a slot's last prompt.
+
+        That slot (or the least recently used one if none match) now holds this prompt.
+        """
+        with self.slot_lock:
+            matches = [common_prefix(prompt, cached) for cached in self.slot_prompts]
+            best = max(range(len(matches)), key=lambda i: (matches[i], -i)) if any(matches) else 0
+            self.slot_prompts.pop(best)
+            self.slot_prompts.append(prompt)
+            return matches[best]
+
+    def ensure_loaded(self, keep_alive: Any) -> float:
+        """Load the model if it has expired, then restart its keep_alive; returns the seconds spent loading."""
+        with self.load_lock:
+            load = 0.0
+            if time.time() >= self.loaded_until:
+                load = self.load_seconds
+                time.sleep(load)
+                self.count("loads")
+            self.loaded_until = time.time() + keep_alive_seconds(keep_alive)
+            return load
+
+    def roll(self) -> random.Random:
+        """A per-request generator, seeded from the server's so runs repeat."""
+        with self.rng_lock:
+            return random.Random(self.rng.random())
+
+    def count(self, name: str, amount: int = 1):
+        with self.counts_lock:
+            self.counts[name] += amount
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: FakeOllama
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self.send_json(200, {"models": [{"name": "llama3.2:latest", "model": "llama3.2:latest"}]})
+        elif self.path == '/api/ps':
+            until = self.server.loaded_until
+            models = []
+            if time.time() < until:
+                expires = '2318-01-01T00:00:00Z' if until == float('inf') else time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(until))
+                models.append({"name": "llama3.2:latest", "model": "llama3.2:latest", "expires_at": expires})
+            self.send_json(200, {"models": models})
+        elif self.path == '/stats':
+            with self.server.counts_lock:
+                self.send_json(200, dict(self.server.counts))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path not in ('/api/generate', '/api/chat'):
+            self.send_json(404, {"error": "not found"})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server = self.server
+        rng = server.roll()
+        server.count("requests")
+
+        if rng.random() < server.error_rate:
+            server.count("errors")
+            self.send_json(500, {"error": "fake ollama: simulated failure"})
+            return
+
+        if not body.get("prompt") and not body.get("messages"):
+            #nothing to generate: Ollama just loads the model and resets its keep_alive
+            started = time.time()
+            load = server.ensure_loaded(body.get("keep_alive"))
+            self.send_json(200, {"model": body.get("model"), **self.content(body, ""), "done": True, "done_reason": "load",
+                                 "total_duration": int((time.time() - started) * 1e9), "load_duration": int(load * 1e9)})
+            return
+
+        with server.slots:
+            started = time.time()
+            load = server.ensure_loaded(body.get("keep_alive"))
+            if rng.random() < server.stall_rate:
+                server.count("stalls")
+                time.sleep(server.stall_seconds)
+            time.sleep(server.ttft)
+
+            prompt, instructions, notes = split_prompt(body)
+            prompt_tokens = len(prompt) // 4
+            cached_tokens = server.claim_slot_cache(prompt) // 4
+            evaluated = max(1, prompt_tokens - cached_tokens)
+            prompt_eval = evaluated / server.prompt_tokens_per_sec
+            time.sleep(prompt_eval)
+            server.count("prompt_tokens", prompt_tokens)
+            server.count("prompt_tokens_cached", cached_tokens)
+
+            tokens = tokenize(render_output(instructions, notes, rng, body.get("format"), server.malformed_rate))
+            limit = (body.get("options") or {}).get("num_predict")
+            if limit and limit > 0:
+                tokens = tokens[:limit]
+
+            timing = {"started": started, "load": load, "prompt_eval_count": evaluated, "prompt_eval": prompt_eval}
+            if body.get("stream", True):
+                self.stream(body, tokens, timing)
+            else:
+                time.sleep(len(tokens) / server.tokens_per_sec)
+                server.count("tokens", len(tokens))
+                self.send_json(200, {**self.final_chunk(body, len(tokens), timing), **self.content(body, ''.join(tokens))})
+
+    def content(self, body: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Generated text in the shape of the endpoint: "response" for generate, "message" for chat."""
+        if 'messages' in body:
+            return {"message": {"role": "assistant", "content": text}}
+        return {"response": text}
+
+    def stream(self, body: Dict[str, Any], tokens: List[str], timing: Dict[str, Any]):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        delay = 1 / self.server.tokens_per_sec
+        try:
+            for i, token in enumerate(tokens):
+                self.write_chunk({"model": body.get("model"), **self.content(body, token), "done": False})
+                self.server.count("tokens")
+                time.sleep(delay)
+            self.write_chunk(self.final_chunk(body, len(tokens), timing))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            #the client stopped reading (e.g. early stop), same as Ollama cancelling the request
+            self.close_connection = True
+
+    def final_chunk(self, body: Dict[str, Any], eval_count: int, timing: Dict[str, Any]) -> Dict[str, Any]:
+        total = time.time() - timing["started"]
+        return {
+            "model": body.get("model"),
+            **self.content(body, ""),
+            "done": True,
+            "total_duration": int(total * 1e9),
+            "load_duration": int(timing["load"] * 1e9),
+            "prompt_eval_count": timing["prompt_eval_count"],
+            "prompt_eval_duration": int(timing["prompt_eval"] * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int(max(0.0, total - timing["load"] - self.server.ttft - timing["prompt_eval"]) * 1e9),
+        }
+
+    def write_chunk(self, data: Dict[str, Any]):
+        line = (json.dumps(data) + "\n").encode()
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def send_json(self, status: int, data: Dict[str, Any]):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--ttft', type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument('--tokens-per-sec', type=float, default=40, help="decode speed of each request")
+    parser.add_argument('--prompt-tokens-per-sec', type=float, default=800, help="prompt processing speed (uncached part)")
+    parser.add_argument('--parallel', type=int, default=4, help="requests served at once, the rest queue")
+    parser.add_argument('--load-seconds', type=float, default=0.0, help="time to load the model when it isn't resident")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="share of text questions written in a broken layout")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="share of requests that hang first")
+    parser.add_argument('--stall-seconds', type=float, default=120, help="how long a stalled request hangs")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    server = FakeOllama((args.host, args.port), args.ttft, args.tokens_per_sec, args.parallel,
+                        args.error_rate, args.stall_rate, args.stall_seconds, args.seed, args.prompt_tokens_per_sec,
+                        args.load_seconds, args.malformed_rate)
+    print(f"Fake Ollama on http://{args.host}:{args.port} (ttft {args.ttft}s, {args.tokens_per_sec} tok/s, "
+          f"{args.parallel} parallel, {args.error_rate:.0%} errors, {args.stall_rate:.0%} stalls)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
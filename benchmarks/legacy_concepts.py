@@ -0,0 +1,34 @@
+"""The original extract_key_concepts, kept as a reference for bench_concepts.py."""
+import re
+from typing import Dict, List, Union
+
+
+def extract_key_concepts(text: str) -> List[Dict[str, Union[str, int]]]:
+    paragraphs = [p for p in text.split('\n\n') if len(p.strip()) > 40]
+
+    if len(paragraphs) < 10:
+        return score_by_frequency(text)
+    else:
+        return [{'text': p, 'score': len(p)} for p in paragraphs]
+
+
+def score_by_frequency(text: str) -> List[Dict[str, Union[str, int]]]:
+    """The sentence scoring branch on its own, so it can be timed on large input too."""
+    lower_text = re.sub(r'[^\w\s.?!]', '', text.lower())
+    words = lower_text.split()
+
+    freq = {}
+    for word in words:
+        if len(word) > 3:
+            freq[word] = freq.get(word, 0) + 1
+
+    sentences = [s.strip() for s in re.split(r'[.?!]', text) if len(s.strip()) > 20]
+
+    scored = []
+    for s in sentences:
+        tokens = s.lower().split()
+        score = sum(freq.get(word, 0) for word in tokens)
+        scored.append({'text': s, 'score': score})
+
+    scored.sort(key=lambda x: x['score'], reverse=True)
+    return scored[:25]
@@ -0,0 +1,89 @@
+"""The original regex parsers, kept as a reference for bench_parsers.py.
+
+These are the regexes question_parser replaced; they're here so the benchmark can check
+the new parser gives the same answers and measure how much faster it is.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+OPTIONS_PATTERN = r'(?:A[\.\)])(.*?)(?:B[\.\)])(.*?)(?:C[\.\)])(.*?)(?:D[\.\)])(.*)'
+
+
+def parse_question_block(block: str) -> Optional[Dict[str, Any]]:
+    block = block.strip()
+    if not block:
+        return None
+
+    lowered = block.lower()
+
+    if 'multiple choice question' in lowered:
+        match = re.search(
+            r'Question:(.*?)\nA\)(.*?)\nB\)(.*?)\nC\)(.*?)\nD\)(.*?)\nAnswer:\s*([A-Da-d])',
+            block, re.DOTALL
+        )
+        if match:
+            q, a, b, c, d, ans = [m.strip() for m in match.groups()]
+            return {
+                'type': 'multiple-choice',
+                'question': q,
+                'options': [a, b, c, d],
+                'correctAnswerIndex': 'ABCD'.index(ans.upper())
+            }
+
+    elif 'true/false question' in lowered or 'true or false' in lowered:
+        match = re.search(r'Question:(.*?)\nAnswer:\s*(True|False)', block, re.DOTALL | re.IGNORECASE)
+        if match:
+            q, ans = [m.strip() for m in match.groups()]
+            return {
+                'type': 'true-false',
+                'question': q if q.lower().startswith("true or false") else f"True or False: {q}",
+                'correctAnswer': ans.lower() == 'true'
+            }
+
+    elif 'fill-in-the-blank question' in lowered:
+        match = re.search(r'Question:(.*?)\nAnswer:\s*(.*)', block, re.DOTALL)
+        if match:
+            q, ans = [m.strip() for m in match.groups()]
+            return {
+                'type': 'fill-blank',
+                'question': q.replace('[BLANK]', '_____').replace('blank', '_____'),
+                'correctAnswer': ans
+            }
+
+    elif 'short answer question' in lowered:
+        match = re.search(r'Question:(.*?)\n(?:Key Terms:|Keywords:)(.*)', block, re.DOTALL)
+        if match:
+            q, keywords = [m.strip() for m in match.groups()]
+            return {
+                'type': 'short-answer',
+                'question': q,
+                'keyTerms': [term.strip() for term in re.split(r',|;', keywords) if term.strip()]
+            }
+
+    return None
+
+
+def parse_questions(text: str, requested_count: int) -> List[Dict[str, Any]]:
+    questions = []
+    for block in re.split(r'\n?={3,}\n?', text):
+        question = parse_question_block(block)
+        if question:
+            questions.append(question)
+        if len(questions) >= requested_count:
+            break
+    return questions
+
+
+def split_qa_pairs(text: str) -> List[Tuple[str, str]]:
+    return [
+        (match.group(1), match.group(2))
+        for match in re.finditer(r"Question:(.*?)Answer:(.*?)(?=Question:|$)", text, re.DOTALL | re.IGNORECASE)
+    ]
+
+
+def split_options(text: str) -> Optional[Tuple[str, List[str]]]:
+    match = re.search(OPTIONS_PATTERN, text, re.DOTALL)
+    if not match:
+        return None
+    clean_question = re.sub(OPTIONS_PATTERN, '', text, flags=re.DOTALL).strip()
+    return clean_question, [group.strip() for group in match.groups()]
@@ -0,0 +1,123 @@
+"""Drive the running app at a fixed request rate and report how it holds up.
+
+Requests are sent open-loop: one every 1/rps seconds whether or not earlier ones have
+finished, and latency is measured from when each request was due, so a backed-up server
+shows up as latency instead of being hidden by a slower send rate. Each request gets its
+own fixed-seed notes and "fresh": true, so the question cache and request coalescing
+don't answer for Ollama. With --cached every request sends the same notes instead and is
+answered from the question cache, which measures the web server rather than the model.
+
+    python benchmarks/fake_ollama.py &
+    OLLAMA_API_URL=http://127.0.0.1:11435 python app.py &
+    python benchmarks/load_test.py --rps 2 --duration 30
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_notes
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def ollama_stats(session: requests.Session, url: str) -> Optional[Dict[str, Any]]:
+    try:
+        return session.get(f"{url}/api/ollama-stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help="where the app is running")
+    parser.add_argument('--rps', type=float, default=2, help="requests started per second")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to keep sending")
+    parser.add_argument('--mode', default='random', help="practiceMode to ask for")
+    parser.add_argument('--difficulty', default='intermediate')
+    parser.add_argument('--count', type=int, default=5, help="questions per request")
+    parser.add_argument('--notes-chars', type=int, default=1500, help="size of the notes sent with each request")
+    parser.add_argument('--timeout', type=float, default=120, help="client-side timeout per request")
+    parser.add_argument('--max-in-flight', type=int, default=256, help="client threads; later requests wait for one")
+    parser.add_argument('--cached', action='store_true', help="send the same notes every time, answered from the cache")
+    args = parser.parse_args()
+
+    total = int(args.rps * args.duration)
+    payloads = [{
+        "notesContent": make_notes(args.notes_chars, seed=0 if args.cached else i),
+        "practiceMode": args.mode,
+        "difficultyLevel": args.difficulty,
+        "count": args.count,
+        "fresh": not args.cached,
+    } for i in range(total)]
+
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.max_in_flight))
+    before = ollama_stats(session, args.url)
+
+    results = []
+    results_lock = threading.Lock()
+
+    def send(payload: Dict[str, Any], due: float):
+        outcome = {"source": None, "status": None, "error": None}
+        try:
+            response = session.post(f"{args.url}/api/generate-questions", json=payload, timeout=args.timeout)
+            outcome["status"] = response.status_code
+            if response.ok:
+                outcome["source"] = response.json().get("source", "unknown")
+        except requests.Timeout:
+            outcome["error"] = "timeout"
+        except requests.RequestException as error:
+            outcome["error"] = type(error).__name__
+        outcome["latency"] = time.perf_counter() - due
+        with results_lock:
+            results.append(outcome)
+
+    print(f"Sending {total} requests at {args.rps} rps to {args.url} ({args.mode}, {args.count} questions each)")
+    executor = ThreadPoolExecutor(max_workers=args.max_in_flight)
+    started = time.perf_counter()
+    for i, payload in enumerate(payloads):
+        due = started + i / args.rps
+        time.sleep(max(0.0, due - time.perf_counter()))
+        executor.submit(send, payload, due)
+    executor.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    after = ollama_stats(session, args.url)
+
+    ok = [r for r in results if r["source"]]
+    latencies = sorted(r["latency"] for r in ok)
+    sources = Counter(r["source"] for r in ok)
+    timeouts = sum(1 for r in results if r["error"] == "timeout")
+    failed = len(results) - len(ok) - timeouts
+
+    print(f"\nFinished in {elapsed:.1f}s")
+    print(f"  throughput        {len(ok) / elapsed:.2f} req/s ({len(ok)}/{total} succeeded)")
+    print(f"  latency (s)       p50 {percentile(latencies, 50):.2f}  p90 {percentile(latencies, 90):.2f}  "
+          f"p95 {percentile(latencies, 95):.2f}  p99 {percentile(latencies, 99):.2f}  "
+          f"max {latencies[-1] if latencies else 0:.2f}")
+    print(f"  sources           {dict(sources)}")
+    print(f"  fallback rate     {sources['local'] / max(1, len(ok)):.1%} answered by local generation")
+    print(f"  timeout rate      {timeouts / max(1, total):.1%} client timeouts, {failed} other failures")
+    if before and after:
+        client_before, client_after = before["client"], after["client"]
+        print(f"  ollama            {client_after['requests'] - client_before['requests']} calls, "
+              f"{client_after['timeouts'] - client_before['timeouts']} timed out, "
+              f"{client_after['errors'] - client_before['errors']} errors, "
+              f"avg queue wait {client_after['avg_queue_wait_ms']:.0f} ms, breaker {after.get('breaker', {}).get('state')}")
+
+
+if __name__ == '__main__':
+    main()
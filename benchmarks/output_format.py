@@ -0,0 +1,107 @@
+"""Compare the text and JSON output formats (OLLAMA_FORMAT) on parse success, retries and latency.
+
+Sends the same requests, one at a time, to each app given with --url (run one with
+OLLAMA_FORMAT=text and one with OLLAMA_FORMAT=json), and reads from each app's /metrics:
+
+- parse success: questions parsed out of what was asked of Ollama, and how many of them
+  JSON mode had to read with the text parser;
+- top-up: questions padded in locally because too few were parsed;
+- retries: Ollama generations retried after a failure, per request;
+- latency: end to end, measured here.
+
+    python benchmarks/fake_ollama.py --port 11435 --malformed-rate 0.1 &
+    OLLAMA_API_URL=http://127.0.0.1:11435 OLLAMA_FORMAT=text PORT=5001 python app.py &
+    OLLAMA_API_URL=http://127.0.0.1:11435 OLLAMA_FORMAT=json PORT=5002 python app.py &
+    python benchmarks/output_format.py --url http://127.0.0.1:5001 --url http://127.0.0.1:5002
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_notes
+from load_test import percentile
+
+MODES = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer', 'random']
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+
+def counters(session: requests.Session, url: str) -> Counter:
+    """Totals of the counters this compares, summed over modes and difficulties."""
+    totals = Counter()
+    for line in session.get(f"{url}/metrics", timeout=10).text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.group(1), dict(_LABEL.findall(match.group(2))), float(match.group(3))
+        if name == 'studybuddy_parsed_questions_total':
+            totals[f"parsed_{labels['parser']}"] += value
+            totals[f"format_{labels['format']}"] += value
+        elif name == 'studybuddy_parse_shortfall_questions_total':
+            totals["shortfall"] += value
+        elif name == 'studybuddy_fallback_questions_total' and labels.get('kind') == 'top_up':
+            totals["top_up"] += value
+        elif name == 'studybuddy_ollama_retries_total':
+            totals["retries"] += value
+    return totals
+
+
+def run(session: requests.Session, url: str, payloads: List[Dict]) -> Dict[str, float]:
+    before = counters(session, url)
+    latencies = []
+    for payload in payloads:
+        started = time.perf_counter()
+        session.post(f"{url}/api/generate-questions", json=payload, timeout=300).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    after = counters(session, url)
+    delta = {key: after[key] - before[key] for key in after}
+
+    parsed = delta.get("parsed_json", 0) + delta.get("parsed_text", 0)
+    latencies.sort()
+    return {
+        "format": 'json' if delta.get("format_json") else 'text',
+        "parsed": parsed / max(1, parsed + delta.get("shortfall", 0)),
+        "text_fallback": delta.get("parsed_text", 0) / max(1, parsed) if delta.get("format_json") else 0.0,
+        "top_up": delta.get("top_up", 0),
+        "retries": delta.get("retries", 0) / len(payloads),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', action='append', help="an app to measure (repeat for each format)")
+    parser.add_argument('--requests', type=int, default=40, help="requests per app, spread over the practice modes")
+    parser.add_argument('--notes-chars', type=int, default=1500)
+    parser.add_argument('--count', type=int, default=5)
+    parser.add_argument('--difficulty', default='intermediate')
+    args = parser.parse_args()
+
+    payloads = [{
+        "notesContent": make_notes(args.notes_chars, seed=300 + i),
+        "practiceMode": MODES[i % len(MODES)],
+        "difficultyLevel": args.difficulty,
+        "count": args.count,
+        "fresh": True,
+    } for i in range(args.requests)]
+
+    session = requests.Session()
+    print(f"{args.requests} requests per app, {args.count} questions each, one at a time")
+    print(f"  {'app':<26}{'format':<8}{'parsed':>8}{'via text':>10}{'top-up':>8}{'retries':>9}{'p50':>8}{'p95':>8}")
+    for url in args.url or ['http://127.0.0.1:5001']:
+        result = run(session, url, payloads)
+        print(f"  {url:<26}{result['format']:<8}{result['parsed']:>8.1%}{result['text_fallback']:>10.1%}"
+              f"{result['top_up']:>8.0f}{result['retries']:>9.2f}{result['p50']:>7.2f}s{result['p95']:>7.2f}s")
+
+
+if __name__ == '__main__':
+    main()
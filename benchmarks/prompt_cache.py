@@ -0,0 +1,89 @@
+"""Measure how much prompt processing Ollama can skip by reusing its cached prompt prefix.
+
+Sends requests one at a time in two patterns a returning student produces: the same
+notes in every practice mode, and the same mode on new notes. Reports Ollama's average
+prompt_eval_duration for each, read from the app's /metrics. Against
+benchmarks/fake_ollama.py it also reports the share of prompt tokens served from cache
+(the fake's /stats).
+
+    python benchmarks/fake_ollama.py --port 11435 --parallel 1 &
+    OLLAMA_API_URL=http://127.0.0.1:11435 python app.py &
+    python benchmarks/prompt_cache.py
+"""
+import argparse
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_notes
+
+MODES = ['multiple-choice', 'true-false', 'fill-blank', 'short-answer', 'random']
+
+
+def prompt_eval_totals(session: requests.Session, url: str) -> Tuple[float, int]:
+    """(seconds, calls) of prompt_eval_duration so far, over every mode and difficulty."""
+    text = session.get(f"{url}/metrics", timeout=10).text
+    seconds, calls = 0.0, 0
+    for line in text.splitlines():
+        if line.startswith("studybuddy_ollama_prompt_eval_seconds_sum"):
+            seconds += float(line.rsplit(' ', 1)[1])
+        elif line.startswith("studybuddy_ollama_prompt_eval_seconds_count"):
+            calls += int(float(line.rsplit(' ', 1)[1]))
+    return seconds, calls
+
+
+def fake_stats(session: requests.Session, url: Optional[str]) -> Optional[Dict[str, int]]:
+    if not url:
+        return None
+    try:
+        return session.get(f"{url}/stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def run(session: requests.Session, args, name: str, requests_to_send):
+    seconds_before, calls_before = prompt_eval_totals(session, args.url)
+    fake_before = fake_stats(session, args.ollama_url)
+    for notes, mode in requests_to_send:
+        session.post(f"{args.url}/api/generate-questions", json={
+            "notesContent": notes, "practiceMode": mode, "difficultyLevel": args.difficulty,
+            "count": args.count, "fresh": True,
+        }, timeout=300).raise_for_status()
+    seconds_after, calls_after = prompt_eval_totals(session, args.url)
+    fake_after = fake_stats(session, args.ollama_url)
+
+    calls = calls_after - calls_before
+    line = f"  {name:<28}{calls:>6} calls   avg prompt eval {1000 * (seconds_after - seconds_before) / max(1, calls):>7.1f} ms"
+    if fake_before and fake_after:
+        total = fake_after["prompt_tokens"] - fake_before["prompt_tokens"]
+        cached = fake_after["prompt_tokens_cached"] - fake_before["prompt_tokens_cached"]
+        line += f"   {cached / max(1, total):>5.1%} of {total} prompt tokens cached"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help="where the app is running")
+    parser.add_argument('--ollama-url', default='http://127.0.0.1:11435', help="fake_ollama.py, for cache stats")
+    parser.add_argument('--documents', type=int, default=4, help="distinct notes per pattern")
+    parser.add_argument('--notes-chars', type=int, default=3000)
+    parser.add_argument('--count', type=int, default=5)
+    parser.add_argument('--difficulty', default='intermediate')
+    args = parser.parse_args()
+
+    session = requests.Session()
+    documents = [make_notes(args.notes_chars, seed=100 + i) for i in range(args.documents * 2)]
+    same_notes = [(notes, mode) for notes in documents[:args.documents] for mode in MODES]
+    same_mode = [(notes, mode) for mode in MODES for notes in documents[args.documents:]]
+
+    print(f"{len(same_notes) + len(same_mode)} requests, {args.count} questions each, one at a time")
+    run(session, args, "same notes, every mode", same_notes)
+    run(session, args, "same mode, new notes", same_mode)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Circuit breaker for the Ollama call path.
+
+Closed: calls go through and their outcomes are recorded. When too many recent calls
+failed or were slow, the breaker opens and calls are refused straight away so the app
+can fall back to local generation instead of waiting on timeouts and retries. After a
+cool-down it goes half-open and lets a single probe call through: success closes it,
+failure opens it again. Each allowed call gets a Permit to report its outcome with, so a
+call that was already running when the breaker opened can't settle the probe's verdict.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the breaker is open."""
+
+
+class Permit:
+    """Handed out by CircuitBreaker.allow for one call."""
+
+    def __init__(self, generation: int, probe: bool):
+        self.generation = generation  #how many times the breaker had opened when the call was allowed
+        self.probe = probe
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = 20,
+        window_seconds: float = 60,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 20,
+        open_seconds: float = 30
+    ):
+        """Opens once at least `min_calls` of the last `window` calls (within `window_seconds`) are in,
+        and `failure_rate` of them failed or took longer than `slow_call_seconds`."""
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)  #(finished_at, failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._counts = {"opened": 0, "rejected": 0, "probes": 0, "successes": 0, "failures": 0, "slow_calls": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow(self) -> Optional[Permit]:
+        """A Permit if a call may go ahead now, else None. In half-open, only the first caller (the probe) gets one.
+
+        Every permit must be handed back to record_success, record_failure or release.
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return Permit(self._generation, probe=False)
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._counts["probes"] += 1
+                return Permit(self._generation, probe=True)
+            self._counts["rejected"] += 1
+            return None
+
+    def record_success(self, permit: Permit, latency: float):
+        """The call worked; `latency` is how long the backend took to start answering."""
+        slow = latency > self.slow_call_seconds
+        with self._lock:
+            self._counts["successes"] += 1
+            if slow:
+                self._counts["slow_calls"] += 1
+            self._record(permit, failed=False, slow=slow)
+
+    def record_failure(self, permit: Permit):
+        with self._lock:
+            self._counts["failures"] += 1
+            self._record(permit, failed=True, slow=False)
+
+    def release(self, permit: Permit):
+        """The caller gave up before finding out whether the backend works; count nothing."""
+        with self._lock:
+            if self._is_probe(permit):
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            outcomes = self._recent()
+            retry_in: Optional[float] = None
+            if self._state == OPEN:
+                retry_in = round(max(0.0, self._opened_at + self.open_seconds - time.time()), 1)
+            return {
+                "state": self._state,
+                "recent_calls": len(outcomes),
+                "failure_rate": round(self._bad_rate(outcomes, failed_only=True), 3),
+                "slow_rate": round(self._bad_rate(outcomes, slow_only=True), 3),
+                "retry_in_seconds": retry_in,
+                **self._counts,
+            }
+
+    def _record(self, permit: Permit, failed: bool, slow: bool):
+        if self._is_probe(permit):
+            self._probe_in_flight = False
+            if failed or slow:
+                self._open()
+            else:
+                print("Ollama circuit closed, probe request succeeded")
+                self._state = CLOSED
+                self._outcomes.clear()
+            return
+
+        #calls allowed before the breaker last opened (or a probe that outlived its half-open) only count in stats
+        if permit.probe or permit.generation != self._generation or self._state != CLOSED:
+            return
+        self._outcomes.append((time.time(), failed, slow))
+        outcomes = self._recent()
+        if len(outcomes) >= self.min_calls and self._bad_rate(outcomes) >= self.failure_rate:
+            self._open()
+
+    def _is_probe(self, permit: Permit) -> bool:
+        return permit.probe and permit.generation == self._generation and self._state == HALF_OPEN
+
+    def _open(self):
+        self._state = OPEN
+        self._generation += 1
+        self._opened_at = time.time()
+        self._counts["opened"] += 1
+        print(f"Ollama circuit opened, using local generation for the next {self.open_seconds:.0f}s")
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.time() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+
+    def _recent(self):
+        cutoff = time.time() - self.window_seconds
+        return [outcome for outcome in self._outcomes if outcome[0] >= cutoff]
+
+    @staticmethod
+    def _bad_rate(outcomes, failed_only: bool = False, slow_only: bool = False) -> float:
+        if not outcomes:
+            return 0.0
+        if failed_only:
+            bad = sum(1 for _, failed, _ in outcomes if failed)
+        elif slow_only:
+            bad = sum(1 for _, _, slow in outcomes if slow)
+        else:
+            bad = sum(1 for _, failed, slow in outcomes if failed or slow)
+        return bad / len(outcomes)
@@ -0,0 +1,171 @@
+"""Server-side document ingestion.
+
+Uploads are streamed to disk in blocks (never held in memory whole) and hashed on the
+way in; the SHA-256 of the file is its document id. Text is extracted in a process
+pool, PDFs a range of pages per task so big files use every worker, and kept on disk
+under that id, so uploading the same file again costs one hash and no extraction.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Dict, List, Optional
+from xml.etree import ElementTree
+
+from pypdf import PdfReader
+
+BLOCK_SIZE = 64 * 1024
+
+SUPPORTED_TYPES = {'pdf', 'docx', 'txt'}
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_DOCUMENT_ID = re.compile(r'[0-9a-f]{64}')
+
+
+class DocumentError(Exception):
+    """Raised for uploads that can't be stored or read (wrong type, too big, unreadable)."""
+
+
+class DocumentStore:
+    def __init__(self, directory: str, max_workers: int = 2, pages_per_task: int = 16, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.max_bytes = max_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._counts = {"uploads": 0, "extracted": 0, "reused": 0, "failed": 0}
+
+    def save(self, stream: IO[bytes], filename: str) -> Dict[str, Any]:
+        """Store an upload and extract its text; returns the document's metadata including its id."""
+        file_type = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if file_type not in SUPPORTED_TYPES:
+            raise DocumentError("Unsupported file format. Please upload a PDF, Word, or Text file.")
+
+        upload_path, document_id = self._write_upload(stream)
+        self._count("uploads")
+        try:
+            meta = self.metadata(document_id)
+            if meta is not None:
+                self._count("reused")
+                #the text is shared by content, but this upload keeps its own name
+                return {**meta, "filename": filename, "cached": True}
+
+            try:
+                text, pages = self._extract(upload_path, file_type)
+            except Exception as error:
+                self._count("failed")
+                raise DocumentError(f"Could not read the {file_type.upper()} file: {error}")
+
+            meta = {"documentId": document_id, "filename": filename, "pages": pages, "characters": len(text)}
+            self._write_text(document_id, text, meta)
+            self._count("extracted")
+            return {**meta, "cached": False}
+        finally:
+            os.remove(upload_path)
+
+    def text(self, document_id: str) -> Optional[str]:
+        """The extracted text of a document, or None if there's no such document."""
+        path = self._path(document_id, 'txt')
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(document_id, 'json')
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"workers": self.max_workers, "pages_per_task": self.pages_per_task, **self._counts}
+
+    def _write_upload(self, stream: IO[bytes]):
+        digest = hashlib.sha256()
+        size = 0
+        os.makedirs(self.directory, exist_ok=True)  #on first use, so merely importing the app creates nothing
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    block = stream.read(BLOCK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > self.max_bytes:
+                        raise DocumentError(f"File is too large, the limit is {self.max_bytes // (1024 * 1024)} MB")
+                    digest.update(block)
+                    f.write(block)
+        except Exception:
+            os.remove(path)
+            raise
+        return path, digest.hexdigest()
+
+    def _write_text(self, document_id: str, text: str, meta: Dict[str, Any]):
+        #write then rename so a reader never sees half a file
+        for extension, content in (('txt', text), ('json', json.dumps(meta))):
+            path = self._path(document_id, extension)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(path + '.tmp', path)
+
+    def _extract(self, path: str, file_type: str):
+        """(text, page count or None) for the file at `path`."""
+        if file_type == 'txt':
+            with open(path, 'rb') as f:
+                return f.read().decode('utf-8', errors='replace'), None
+        if file_type == 'docx':
+            return self._executor().submit(extract_docx_text, path).result(), None
+
+        pages = len(PdfReader(path).pages)
+        ranges = [(start, min(start + self.pages_per_task, pages)) for start in range(0, pages, self.pages_per_task)]
+        futures = [self._executor().submit(extract_pdf_pages, path, start, end) for start, end in ranges]
+        return '\n'.join(page for future in futures for page in future.result()), pages
+
+    def _executor(self) -> ProcessPoolExecutor:
+        #started on first use; spawn so workers don't inherit the server's threads and locks
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _path(self, document_id: str, extension: str) -> Optional[str]:
+        if not _DOCUMENT_ID.fullmatch(document_id or ''):
+            return None
+        return os.path.join(self.directory, f"{document_id}.{extension}")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    """Text of pages [start, end) of a PDF; runs in a worker process."""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or '' for i in range(start, end)]
+
+
+def extract_docx_text(path: str) -> str:
+    """Plain text of a .docx, paragraphs separated by blank lines like mammoth does; runs in a worker process."""
+    with zipfile.ZipFile(path) as docx:
+        root = ElementTree.fromstring(docx.read('word/document.xml'))
+    paragraphs = []
+    for paragraph in root.iter(f'{_WORD_NS}p'):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f'{_WORD_NS}t':
+                parts.append(node.text or '')
+            elif node.tag == f'{_WORD_NS}tab':
+                parts.append('\t')
+            elif node.tag in (f'{_WORD_NS}br', f'{_WORD_NS}cr'):
+                parts.append('\n')
+        paragraphs.append(''.join(parts))
+    return '\n\n'.join(paragraphs)
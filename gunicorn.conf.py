@@ -0,0 +1,40 @@
+"""Gunicorn settings for running the app in production:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Requests spend almost all their time waiting on Ollama, so the default is a single
+worker process with many threads (gthread) rather than many processes. The app also
+keeps state in memory: background jobs, request coalescing, caches, the circuit breaker,
+metrics and traces. With more than one worker, each worker has its own copy of that
+state, so a job is only visible to the worker that created it. Raise WEB_WORKERS only
+behind a load balancer that keeps each client on one worker.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5001)}"
+worker_class = 'gthread'
+workers = int(os.getenv("WEB_WORKERS", 1))
+#each streaming or waiting request holds a thread for as long as ollama takes
+threads = int(os.getenv("WEB_THREADS", 32))
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+
+#longer than one ollama call, so a restart or a missed heartbeat doesn't cut off a generation midway
+_generation_timeout = float(os.getenv("OLLAMA_DEADLINE", 90))
+timeout = int(os.getenv("WEB_TIMEOUT", _generation_timeout + 30))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", _generation_timeout + 30))
+
+#import the app once in the master, so a broken config fails at startup and workers start fast
+preload_app = True
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-") or None
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    #threads don't survive the fork from the preloading master, so each worker starts its own
+    import app
+    app.start_background_tasks()
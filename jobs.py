@@ -0,0 +1,118 @@
+"""Background jobs for question generation.
+
+POSTing a job returns straight away; a bounded worker pool does the slow model work
+and clients poll for status, partial results and the final result. Finished jobs are
+forgotten after a TTL, and new jobs are refused once too many are waiting.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its limit."""
+
+
+class Job:
+    def __init__(self, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.partial: List[Dict[str, Any]] = []
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def set_partial(self, questions: List[Dict[str, Any]]):
+        """Called from the worker with the questions generated so far."""
+        with self._lock:
+            self.partial = list(questions)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                'jobId': self.id,
+                'status': self.status,
+                'createdAt': self.created_at,
+                'startedAt': self.started_at,
+                'finishedAt': self.finished_at,
+            }
+            if self.status == 'done':
+                data['result'] = self.result
+            elif self.status == 'failed':
+                data['error'] = self.error
+            else:
+                data['partial'] = list(self.partial)
+            return data
+
+
+class JobManager:
+    def __init__(self, run: Callable[[Job], Any], max_workers: int = 4, max_queue: int = 32, ttl: float = 600):
+        """`run` does the work for a job and returns its result; it can call job.set_partial as it goes."""
+        self.run = run
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+
+    def submit(self, params: Dict[str, Any]) -> Job:
+        self._expire()
+        job = Job(params)
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == 'queued')
+            if queued >= self.max_queue:
+                raise QueueFullError(f"Too many jobs waiting ({queued}), try again later")
+            self._jobs[job.id] = job
+        self._executor.submit(self._work, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        self._expire()
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'done': statuses.count('done'),
+            'failed': statuses.count('failed'),
+        }
+
+    def _work(self, job: Job):
+        with job._lock:
+            job.status = 'running'
+            job.started_at = time.time()
+        try:
+            result = self.run(job)
+        except Exception as error:
+            print(f"Job {job.id} failed: {error}")
+            with job._lock:
+                job.status = 'failed'
+                job.error = str(error)
+                job.finished_at = time.time()
+            return
+        with job._lock:
+            job.status = 'done'
+            job.result = result
+            job.finished_at = time.time()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
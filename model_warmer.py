@@ -0,0 +1,148 @@
+"""Keep the Ollama model loaded so users don't wait for it to load.
+
+Loading a model can take longer than a whole generation, and Ollama unloads it after
+keep_alive without requests. ModelWarmer loads the model once at startup (a request with
+no prompt, which Ollama answers by just loading it), then during busy hours sends the
+same cheap request every `interval` seconds so keep_alive never runs out. Outside busy
+hours the model is left to unload and free the GPU; the first ping of the next busy
+period loads it again before users arrive. Whether the model is resident is read from
+Ollama's /api/ps.
+"""
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_DURATION = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*$')
+_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, None: 1}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Seconds for an Ollama keep_alive value like "30m", "1h", "300" or "-1" (None means forever)."""
+    match = _DURATION.match(str(value))
+    if not match:
+        raise ValueError(f"Not a duration: {value!r}")
+    seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    return None if seconds < 0 else seconds
+
+
+def parse_hours(value: str) -> List[Tuple[int, int]]:
+    """Hour ranges like "7-12,13-23" (local time, end exclusive, "22-6" wraps midnight); empty means all day."""
+    ranges = []
+    for part in filter(None, (part.strip() for part in value.split(','))):
+        start, _, end = part.partition('-')
+        start, end = int(start), int(end or int(start) + 1)
+        if not (0 <= start <= 23 and 0 <= end <= 24):
+            raise ValueError(f"Bad hour range: {part!r}")
+        ranges.append((start, end))
+    return ranges
+
+
+class ModelWarmer:
+    def __init__(self, client, model: str, keep_alive: str = '30m', interval: float = 300,
+                 busy_hours: str = '', warmup_timeout: float = 300):
+        self.client = client
+        self.model = model
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.busy_hours = busy_hours
+        self.warmup_timeout = warmup_timeout
+        self._hours = parse_hours(busy_hours)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._state: Dict[str, Any] = {
+            "resident": None,  #unknown until the first /api/ps
+            "expires_at": None,
+            "last_warmup": None,
+            "last_check": None,
+            "error": None,
+            "warmups": 0,
+            "pings": 0,
+            "failures": 0,
+        }
+
+        keep_alive_seconds = parse_duration(keep_alive)
+        if keep_alive_seconds is not None and interval >= keep_alive_seconds:
+            print(f"Warning: model ping interval {interval}s is not shorter than keep_alive {keep_alive}, "
+                  f"the model will unload between pings")
+
+    def start(self):
+        """Warm the model up and keep it resident from a background thread (once per process)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='model-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def in_busy_hours(self, hour: Optional[int] = None) -> bool:
+        if not self._hours:
+            return True
+        hour = time.localtime().tm_hour if hour is None else hour
+        return any(start <= hour < end if start < end else hour >= start or hour < end for start, end in self._hours)
+
+    def warm(self, reason: str = 'ping') -> bool:
+        """Ask Ollama to load the model (a no-op apart from resetting keep_alive if it's loaded)."""
+        started = time.monotonic()
+        try:
+            #ollama sends nothing until the model is loaded, so the client's read timeout can't apply
+            result = self.client.generate({"model": self.model, "keep_alive": self.keep_alive},
+                                          deadline=self.warmup_timeout, read_timeout=self.warmup_timeout)
+        except Exception as error:
+            print(f"Model {reason} failed: {error}")
+            with self._lock:
+                self._state["failures"] += 1
+                self._state["error"] = str(error)
+            return False
+
+        seconds = time.monotonic() - started
+        load_seconds = result.get("load_duration", 0) / 1e9
+        if reason == 'startup' or load_seconds > 1:
+            print(f"Model {self.model} {reason}: ready in {seconds:.1f}s (load {load_seconds:.1f}s)")
+        with self._lock:
+            self._state["warmups" if reason == 'startup' else "pings"] += 1
+            self._state["last_warmup"] = {"at": time.time(), "reason": reason, "seconds": round(seconds, 3),
+                                          "load_seconds": round(load_seconds, 3)}
+            self._state["error"] = None
+        return True
+
+    def check(self) -> Optional[bool]:
+        """Ask Ollama whether the model is loaded right now; None if Ollama can't be asked."""
+        try:
+            loaded = self.client.get('/api/ps', deadline=5).get("models", [])
+        except Exception as error:
+            with self._lock:
+                self._state.update(resident=None, expires_at=None, last_check=time.time(), error=str(error))
+            return None
+
+        names = {self.model, f"{self.model}:latest"}
+        match = next((m for m in loaded if m.get("name") in names or m.get("model") in names), None)
+        with self._lock:
+            self._state.update(resident=match is not None, expires_at=match.get("expires_at") if match else None,
+                               last_check=time.time())
+        return match is not None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            state = dict(self._state)
+        return {
+            "model": self.model,
+            "keep_alive": self.keep_alive,
+            "ping_interval": self.interval,
+            "busy_hours": self.busy_hours or "all day",
+            "busy_now": self.in_busy_hours(),
+            "running": self._thread is not None and self._thread.is_alive(),
+            **state,
+        }
+
+    def _run(self):
+        self.warm('startup')
+        self.check()
+        while not self._stop.wait(self.interval):
+            #real requests carry keep_alive too, so only ping while nothing else is talking to ollama
+            if self.in_busy_hours() and self.client.stats()["in_flight"] == 0:
+                self.warm('ping')
+            self.check()
@@ -0,0 +1,165 @@
+"""Per-document analysis shared by the local question generators.
+
+The fallback and simulation paths used to re-split and re-tokenize the whole notes text
+for every call (and the same sentence several times per question). A NotesIndex does
+that work once per document: the sentence lists each generator draws from and the
+scored concepts are built on first use, and each Sentence works out its words, keywords
+and blank positions the first time a question is made from it. Indexes are cached by
+content hash, so generating many questions from a large document costs roughly one
+analysis plus a little per question.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import Dict, List, Optional, Union
+
+from concept_scoring import score_concepts
+
+COMMON_WORDS = {'about', 'after', 'again', 'below', 'could', 'every', 'first', 'found', 'great',
+                'house', 'large', 'learn', 'never', 'other', 'place', 'small', 'study', 'think',
+                'where', 'which', 'world', 'would', 'write', 'their', 'there', 'these', 'those'}
+
+KEYWORD_STOPWORDS = {'the', 'and', 'or', 'but', 'for', 'nor', 'on', 'at', 'to', 'from', 'by', 'with', 'in', 'out', 'about', 'than'}
+
+IMPORTANT_WORD = re.compile(r'\b(is|are|was|were|has|have|will|should|could|must|main|key|critical|important|essential|primary|necessary|fundamental|crucial|significant)\b', re.IGNORECASE)
+
+
+def extract_keywords2(text: str) -> List[str]:
+    """Extract potential keywords from text."""
+    words = re.findall(r'\b[A-Za-z][A-Za-z-]{3,}\b', text)
+    keywords = [word for word in words if word.lower() not in KEYWORD_STOPWORDS]
+    return list(set(keywords))[:3]  #limited to top 3 keywords
+
+
+class Sentence:
+    """One sentence of the notes plus the bits of analysis the question builders need.
+
+    Everything is worked out on first use and kept, so reusing a sentence is free.
+    Lists handed out here are shared; copy before changing them.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    @cached_property
+    def words(self) -> List[str]:
+        return self.text.split()
+
+    @cached_property
+    def space_words(self) -> List[str]:
+        """Words split on single spaces, the way the simulation builders always split them."""
+        return self.text.split(' ')
+
+    @cached_property
+    def keywords(self) -> List[str]:
+        return extract_keywords2(self.text)
+
+    @cached_property
+    def key_term_pool(self) -> List[str]:
+        """Capitalized phrases and long words, lowercased and deduped."""
+        capitalized_terms = re.findall(r'[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*', self.text)
+        long_words = [w for w in self.words if len(w) > 5]
+        return list(set(term.lower() for term in capitalized_terms + long_words))
+
+    @cached_property
+    def important_word_index(self) -> Optional[int]:
+        """First long word like "important" or "essential", the preferred blank for a fill-in question."""
+        for i, word in enumerate(self.space_words):
+            if len(word) > 4 and IMPORTANT_WORD.search(word):
+                return i
+        return None
+
+    @cached_property
+    def long_word_indices(self) -> List[int]:
+        return [i for i, word in enumerate(self.space_words) if len(word) > 4]
+
+    @cached_property
+    def blank_candidates(self) -> List[int]:
+        """Positions in `words` worth blanking out: uncommon long words, else any word over 3 letters."""
+        candidates = [i for i, word in enumerate(self.words) if len(word) > 4 and word.lower() not in COMMON_WORDS]
+        return candidates or [i for i, word in enumerate(self.words) if len(word) > 3]
+
+    @cached_property
+    def ranked_terms(self) -> List[str]:
+        """Distinct uncommon words, longest first."""
+        words = [w for w in re.sub(r'[^\w\s]', '', self.text.lower()).split() if len(w) > 4]
+        terms = list(set(w for w in words if w not in COMMON_WORDS))
+        terms.sort(key=len, reverse=True)
+        return terms
+
+
+class NotesIndex:
+    """Everything the local generators read from one notes document."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self._sentences: Dict[str, Sentence] = {}
+        self._concept_sentences: Dict[int, List[Sentence]] = {}
+
+    def sentence(self, text: str) -> Sentence:
+        """The shared Sentence for `text`, so its analysis is done at most once per document."""
+        sentence = self._sentences.get(text)
+        if sentence is None:
+            sentence = self._sentences.setdefault(text, Sentence(text))
+        return sentence
+
+    @cached_property
+    def concepts(self) -> List[Dict[str, Union[str, float]]]:
+        """Key concepts: the best sentences by TF-IDF score (see concept_scoring), best first."""
+        return score_concepts(self.text)
+
+    def concept_sentences(self, index: int) -> List[Sentence]:
+        """The sentences (over 15 chars) of concept number `index`."""
+        sentences = self._concept_sentences.get(index)
+        if sentences is None:
+            text = self.concepts[index]['text']
+            sentences = [self.sentence(s.strip()) for s in re.split(r'[.?!]', text) if len(s.strip()) > 15]
+            self._concept_sentences[index] = sentences
+        return sentences
+
+    @cached_property
+    def fallback_sentences(self) -> List[Sentence]:
+        """Sentences over 20 chars from paragraphs that look like prose rather than code."""
+        sentences = []
+        for paragraph in self.text.split('\n\n'):
+            if len(paragraph.strip()) < 30 or '@app.' in paragraph or 'def ' in paragraph:
+                continue
+            sentences.extend(self.sentence(s.strip()) for s in re.split(r'[.!?]', paragraph) if len(s.strip()) > 20)
+        return sentences
+
+    @cached_property
+    def basic_sentences(self) -> List[Sentence]:
+        """Sentences over 10 chars, with their full stop put back."""
+        return [self.sentence(s.strip() + '.') for s in re.split(r'[.!?]\s+', self.text) if len(s.strip()) > 10]
+
+
+class NotesIndexCache:
+    """Small LRU of NotesIndex objects keyed by a hash of the notes text."""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, NotesIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> NotesIndex:
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index
+            self.misses += 1
+            index = NotesIndex(text)
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+            return index
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._indexes), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
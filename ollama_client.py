@@ -0,0 +1,226 @@
+"""Shared HTTP client for talking to Ollama.
+
+Every call to the model server goes through one OllamaClient so connections are kept
+alive and reused, connect/read timeouts are separate from the overall deadline, and
+only a limited number of requests are in flight at once (the rest queue for a slot).
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OllamaError(Exception):
+    """Raised when Ollama can't be reached or returns an error."""
+
+
+class OllamaTimeoutError(OllamaError):
+    """Raised when a call runs past its connect/read timeout or its total deadline."""
+
+
+class OllamaBusyError(OllamaError):
+    """Raised when no concurrency slot frees up in time; the call never reached Ollama."""
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        base_url: str,
+        max_concurrency: int = 4,
+        connect_timeout: float = 5,
+        read_timeout: float = 90,
+        deadline: float = 90,
+        queue_timeout: float = 30
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.queue_timeout = queue_timeout
+
+        #never more than max_concurrency requests in flight, so that's all the pool needs to hold
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._adapter = adapter
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {
+            'in_flight': 0,
+            'waiting': 0,
+            'requests': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'rejected': 0,
+            'queue_wait_total': 0.0,
+        }
+
+    def generate(self, payload: Dict[str, Any], deadline: Optional[float] = None,
+                 read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST a non-streaming request to /api/generate and return the decoded body."""
+        return self.post('/api/generate', dict(payload, stream=False), deadline, read_timeout)
+
+    def stream_generate(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """POST a streaming request to /api/generate and yield each decoded chunk.
+
+        The concurrency slot and connection are held until the generator is exhausted or
+        closed, so callers that stop early should close it (e.g. with contextlib.closing).
+        """
+        return self.stream('/api/generate', dict(payload, stream=True), deadline)
+
+    def stream_chat(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """POST a streaming request to /api/chat and yield each decoded chunk (same slot rules as stream_generate)."""
+        return self.stream('/api/chat', dict(payload, stream=True), deadline)
+
+    def post(self, path: str, payload: Dict[str, Any], deadline: Optional[float] = None,
+             read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST a JSON request and return the decoded JSON response.
+
+        read_timeout overrides the client's for calls known to go quiet for longer, like a model load.
+        """
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        with self._slot(expires_at):
+            response = self._send('POST', path, expires_at, read_timeout, json=payload)
+            with response:
+                body = bytearray()
+                for data in self._guard(response.iter_content(chunk_size=8192)):
+                    self._check_deadline(expires_at)
+                    body.extend(data)
+            try:
+                return json.loads(body)
+            except ValueError:
+                self._count('errors')
+                raise OllamaError(f"Invalid JSON from Ollama: {bytes(body[:200])!r}")
+
+    def get(self, path: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """GET a JSON endpoint such as /api/tags."""
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        with self._slot(expires_at):
+            response = self._send('GET', path, expires_at)
+            with response:
+                return response.json()
+
+    def stream(self, path: str, payload: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """POST a JSON request and yield each line of the NDJSON response."""
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        with self._slot(expires_at):
+            response = self._send('POST', path, expires_at, json=payload)
+            with response:
+                for line in self._guard(response.iter_lines()):
+                    self._check_deadline(expires_at)
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        self._count('errors')
+                        raise OllamaError(f"Ollama API error: {chunk['error']}")
+                    yield chunk
+
+    def free_slots(self) -> int:
+        """Slots no request holds or is queued for right now."""
+        with self._lock:
+            return self.max_concurrency - self._stats['in_flight'] - self._stats['waiting']
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of concurrency and connection pool usage."""
+        with self._lock:
+            stats = dict(self._stats)
+
+        finished = stats['requests'] + stats['rejected']
+        stats['avg_queue_wait_ms'] = round(1000 * stats.pop('queue_wait_total') / finished, 1) if finished else 0.0
+        stats['max_concurrency'] = self.max_concurrency
+
+        connections_opened = 0
+        requests_sent = 0
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+            requests_sent += pool.num_requests
+        stats['connections_opened'] = connections_opened
+        stats['connections_reused'] = max(0, requests_sent - connections_opened)
+        return stats
+
+    @contextmanager
+    def _slot(self, expires_at: float):
+        """Wait (politely) for one of the max_concurrency slots."""
+        wait_start = time.monotonic()
+        self._count('waiting')
+        acquired = self._slots.acquire(timeout=max(0, min(self.queue_timeout, expires_at - wait_start)))
+        waited = time.monotonic() - wait_start
+
+        with self._lock:
+            self._stats['waiting'] -= 1
+            self._stats['queue_wait_total'] += waited
+            if acquired:
+                self._stats['in_flight'] += 1
+                self._stats['requests'] += 1
+            else:
+                self._stats['rejected'] += 1
+
+        if not acquired:
+            raise OllamaBusyError(f"Ollama is busy: no free slot after waiting {waited:.1f}s")
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stats['in_flight'] -= 1
+            self._slots.release()
+
+    def _send(self, method: str, path: str, expires_at: float, read_timeout: Optional[float] = None,
+              **kwargs) -> requests.Response:
+        self._check_deadline(expires_at)
+        read_timeout = min(read_timeout or self.read_timeout, max(0.001, expires_at - time.monotonic()))
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}{path}",
+                timeout=(self.connect_timeout, read_timeout),
+                stream=True,
+                **kwargs
+            )
+        except requests.exceptions.Timeout:
+            self._count('timeouts')
+            raise OllamaTimeoutError(f"Request to Ollama timed out")
+        except requests.exceptions.RequestException as error:
+            self._count('errors')
+            raise OllamaError(f"Could not reach Ollama: {error}")
+
+        if response.status_code != 200:
+            print(f"API Error: {response.status_code} {response.reason}")
+            error_text = response.text
+            response.close()
+            self._count('errors')
+            raise OllamaError(f"Ollama API error: {response.status_code} - {error_text}")
+
+        return response
+
+    def _guard(self, body: Iterator[bytes]) -> Iterator[bytes]:
+        """Turn errors raised while reading a response body into Ollama errors."""
+        try:
+            yield from body
+        except requests.exceptions.ConnectionError as error:
+            #urllib3 surfaces read timeouts mid-stream as connection errors
+            if 'timed out' in str(error).lower():
+                self._count('timeouts')
+                raise OllamaTimeoutError(f"Request to Ollama timed out")
+            self._count('errors')
+            raise OllamaError(f"Lost connection to Ollama: {error}")
+
+    def _check_deadline(self, expires_at: float):
+        if time.monotonic() > expires_at:
+            self._count('timeouts')
+            raise OllamaTimeoutError(f"Request to Ollama ran past its deadline")
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
@@ -0,0 +1,245 @@
+"""Spread Ollama calls over several Ollama servers.
+
+OllamaPool has OllamaClient's interface, with one OllamaClient (and its own concurrency
+limit) per backend. Each call goes to the healthy backend with the most free slots,
+then the lowest rolling time to first chunk. A backend is taken out of rotation after
+`unhealthy_after` failed calls in a row, or when the background health check (a GET of
+/api/tags outside its concurrency limit) fails, and put back when a check succeeds. If
+every backend is out of rotation, calls go to all of them anyway rather than failing
+outright.
+
+Callers that retry can ask for a different backend: calls made inside
+`with pool.routing(avoid=...) as used:` skip the `avoid` backends while any other is
+healthy, and add the backends they used to `used`. The routing is a context variable,
+so it also covers calls made from worker threads that run in a copy of the context.
+"""
+import contextvars
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from ollama_client import OllamaBusyError, OllamaClient
+
+#(backends to avoid, set collecting the backends used) for calls in the current context
+_routing: contextvars.ContextVar[Tuple[FrozenSet[str], Optional[Set[str]]]] = contextvars.ContextVar(
+    'ollama_routing', default=(frozenset(), None)
+)
+
+LATENCY_SMOOTHING = 0.2  #weight of the newest sample in the rolling time to first chunk
+
+
+def parse_urls(value: str) -> List[str]:
+    """Backend URLs from a comma- or space-separated OLLAMA_API_URL."""
+    urls = [url.strip().rstrip('/') for url in value.replace(',', ' ').split()]
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+class Backend:
+    def __init__(self, url: str, client: OllamaClient):
+        self.url = url
+        self.client = client
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.latency: Optional[float] = None  #rolling seconds to the first streamed chunk
+        self.routed = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_check: Optional[float] = None
+
+
+class OllamaPool:
+    def __init__(self, urls: List[str], health_interval: float = 10, unhealthy_after: int = 3,
+                 health_timeout: float = 3, **client_options: Any):
+        if not urls:
+            raise ValueError("At least one Ollama URL is needed")
+        self.backends = [Backend(url, OllamaClient(url, **client_options)) for url in urls]
+        self.health_interval = health_interval
+        self.unhealthy_after = unhealthy_after
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._health_session = requests.Session()
+
+    @property
+    def base_url(self) -> str:
+        return ', '.join(backend.url for backend in self.backends)
+
+    @contextmanager
+    def routing(self, avoid: Set[str] = frozenset()) -> Iterator[Set[str]]:
+        """Steer calls in this block away from `avoid` (backend URLs); yields the set of backends they used."""
+        used: Set[str] = set()
+        token = _routing.set((frozenset(avoid), used))
+        try:
+            yield used
+        finally:
+            _routing.reset(token)
+
+    def has_alternative(self, avoid: Set[str]) -> bool:
+        """Whether a healthy backend outside `avoid` exists."""
+        return any(backend.healthy and backend.url not in avoid for backend in self.backends)
+
+    def can_fail_over(self) -> bool:
+        """Whether more than one backend is in rotation, so a failing one can be routed around."""
+        return sum(backend.healthy for backend in self.backends) > 1
+
+    def generate(self, payload: Dict[str, Any], deadline: Optional[float] = None,
+                 read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST a non-streaming request to /api/generate and return the decoded body."""
+        return self.post('/api/generate', dict(payload, stream=False), deadline, read_timeout)
+
+    def stream_generate(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """POST a streaming request to /api/generate and yield each decoded chunk."""
+        return self.stream('/api/generate', dict(payload, stream=True), deadline)
+
+    def stream_chat(self, payload: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """POST a streaming request to /api/chat and yield each decoded chunk."""
+        return self.stream('/api/chat', dict(payload, stream=True), deadline)
+
+    def post(self, path: str, payload: Dict[str, Any], deadline: Optional[float] = None,
+             read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        backend = self._choose()
+        try:
+            result = backend.client.post(path, payload, deadline, read_timeout)
+        except Exception as error:
+            self._record_failure(backend, error)
+            raise
+        self._record_success(backend)
+        return result
+
+    def get(self, path: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        backend = self._choose()
+        try:
+            result = backend.client.get(path, deadline)
+        except Exception as error:
+            self._record_failure(backend, error)
+            raise
+        self._record_success(backend)
+        return result
+
+    def stream(self, path: str, payload: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Like OllamaClient.stream; the backend is picked when iteration starts, as that's when a slot is taken."""
+        backend = self._choose()
+        started = time.monotonic()
+        first = True
+        try:
+            with closing(backend.client.stream(path, payload, deadline)) as chunks:
+                for chunk in chunks:
+                    if first:
+                        self._record_latency(backend, time.monotonic() - started)
+                        first = False
+                    yield chunk
+        except Exception as error:
+            self._record_failure(backend, error)
+            raise
+        self._record_success(backend)
+
+    def free_slots(self) -> int:
+        """Free slots over the backends in rotation."""
+        return sum(max(0, backend.client.free_slots()) for backend in self.backends if backend.healthy)
+
+    def stats(self) -> Dict[str, Any]:
+        """OllamaClient.stats() summed over the backends, with each backend's own under `backends`."""
+        per_backend = []
+        totals: Dict[str, Any] = {}
+        queue_wait_ms = 0.0
+        for backend in self.backends:
+            stats = backend.client.stats()
+            finished = stats['requests'] + stats['rejected']
+            queue_wait_ms += stats['avg_queue_wait_ms'] * finished
+            for key, value in stats.items():
+                if key != 'avg_queue_wait_ms':
+                    totals[key] = totals.get(key, 0) + value
+            with self._lock:
+                per_backend.append({
+                    "url": backend.url,
+                    "healthy": backend.healthy,
+                    "routed": backend.routed,
+                    "failures": backend.failures,
+                    "consecutive_failures": backend.consecutive_failures,
+                    "latency_ms": round(backend.latency * 1000, 1) if backend.latency is not None else None,
+                    "last_error": backend.last_error,
+                    "last_check": backend.last_check,
+                    **stats,
+                })
+        finished = totals.get('requests', 0) + totals.get('rejected', 0)
+        totals['avg_queue_wait_ms'] = round(queue_wait_ms / finished, 1) if finished else 0.0
+        totals['backends'] = per_backend
+        return totals
+
+    def start_health_checks(self):
+        """Check every backend every health_interval seconds from a background thread (once per process)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run_health_checks, name='ollama-health', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self, backend: Backend) -> bool:
+        """GET /api/tags on one backend, outside its concurrency limit so a busy backend still answers."""
+        try:
+            response = self._health_session.get(f"{backend.url}/api/tags", timeout=self.health_timeout)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            with self._lock:
+                if backend.healthy:
+                    print(f"Ollama backend {backend.url} failed its health check, taking it out of rotation: {error}")
+                backend.healthy = False
+                backend.last_error = str(error)
+                backend.last_check = time.time()
+            return False
+
+        with self._lock:
+            if not backend.healthy:
+                print(f"Ollama backend {backend.url} is healthy again")
+            backend.healthy = True
+            backend.consecutive_failures = 0
+            backend.last_check = time.time()
+        return True
+
+    def _run_health_checks(self):
+        while not self._stop.wait(self.health_interval):
+            for backend in self.backends:
+                self.check(backend)
+
+    def _choose(self) -> Backend:
+        avoid, used = _routing.get()
+        with self._lock:
+            healthy = [backend for backend in self.backends if backend.healthy]
+            candidates = [backend for backend in healthy if backend.url not in avoid] or healthy or self.backends
+            #most free slots first, then the fastest to start answering (untried backends count as fast)
+            backend = min(candidates, key=lambda b: (-b.client.free_slots(), b.latency or 0.0))
+            backend.routed += 1
+        if used is not None:
+            used.add(backend.url)
+        return backend
+
+    def _record_latency(self, backend: Backend, seconds: float):
+        with self._lock:
+            if backend.latency is None:
+                backend.latency = seconds
+            else:
+                backend.latency += LATENCY_SMOOTHING * (seconds - backend.latency)
+
+    def _record_success(self, backend: Backend):
+        with self._lock:
+            backend.consecutive_failures = 0
+            backend.healthy = True
+
+    def _record_failure(self, backend: Backend, error: Exception):
+        if isinstance(error, OllamaBusyError):
+            return  #our own queue was full; the backend wasn't asked
+        with self._lock:
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.last_error = f"{type(error).__name__}: {error}"
+            if backend.healthy and backend.consecutive_failures >= self.unhealthy_after and len(self.backends) > 1:
+                print(f"Ollama backend {backend.url} failed {backend.consecutive_failures} calls in a row, "
+                      f"taking it out of rotation")
+                backend.healthy = False
@@ -0,0 +1,87 @@
+"""Token budgets for generation prompts.
+
+The prompt and the model's answer share one context window. The answer's size is
+predictable from the practice mode and question count, so it's reserved first (and
+becomes num_predict, so a runaway answer can't go on much longer than a good one);
+the notes get whatever room is left after the instructions, cut at a sentence boundary.
+Token counts are estimates from text_chunks.estimate_tokens.
+"""
+import math
+import re
+from typing import Any, Dict, List
+
+from text_chunks import CHARS_PER_TOKEN, estimate_tokens
+
+#typical answer size per question in tokens, from real model output (headers and separators included)
+OUTPUT_TOKENS_PER_QUESTION = {
+    'multiple-choice': 48,
+    'true-false': 30,
+    'fill-blank': 33,
+    'short-answer': 58,
+    'random': 45,
+}
+#keys, quotes and brackets a JSON answer (OLLAMA_FORMAT=json) adds around the same content
+JSON_TOKENS_PER_QUESTION = 18
+#an intro line like "Here are 5 questions based on the notes:"
+OUTPUT_OVERHEAD_TOKENS = 32
+#role headers and end-of-turn tokens the chat template wraps around each message
+MESSAGE_OVERHEAD_TOKENS = 8
+
+#the estimate is rough, so leave part of the context unused rather than overflow it
+CONTEXT_HEADROOM = 0.1
+#never squeeze the notes below this, even for very large question counts
+MIN_NOTES_TOKENS = 128
+
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]?(?=\s|$)')
+
+
+def expected_output_tokens(practice_mode: str, count: int, output_format: str = 'text') -> int:
+    per_question = OUTPUT_TOKENS_PER_QUESTION.get(practice_mode, OUTPUT_TOKENS_PER_QUESTION['random'])
+    if output_format == 'json':
+        per_question += JSON_TOKENS_PER_QUESTION
+    return OUTPUT_OVERHEAD_TOKENS + per_question * count
+
+
+def messages_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def plan_budget(
+    template_tokens: int, practice_mode: str, count: int, num_ctx: int, margin: float = 1.5, output_format: str = 'text'
+) -> Dict[str, Any]:
+    """Split the context window between instructions, notes and the answer.
+
+    `template_tokens` is the size of the prompt without notes. Returns the decisions,
+    including `num_predict` and `notes_tokens` (how much of the notes fit).
+    """
+    expected = expected_output_tokens(practice_mode, count, output_format)
+    num_predict = math.ceil(expected * margin)
+    usable = int(num_ctx * (1 - CONTEXT_HEADROOM))
+    notes_tokens = max(MIN_NOTES_TOKENS, usable - template_tokens - num_predict)
+    return {
+        "num_ctx": num_ctx,
+        "template_tokens": template_tokens,
+        "expected_output_tokens": expected,
+        "num_predict": num_predict,
+        "notes_tokens": notes_tokens,
+        "overflows": template_tokens + notes_tokens + num_predict > num_ctx,
+    }
+
+
+def fit_to_budget(text: str, max_tokens: int) -> str:
+    """The longest start of `text` within max_tokens, ending on a sentence boundary where there is one."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars + 1]  #one extra so a sentence ending exactly at the limit still counts as ended
+
+    last_end = None
+    for match in _SENTENCE_END.finditer(cut, max_chars // 2):
+        if match.end() <= max_chars:
+            last_end = match.end()
+    if last_end is not None:
+        return cut[:last_end]
+
+    #no sentence ends in the second half: cut between words instead
+    space = cut.rfind(' ', 0, max_chars)
+    return cut[:space] if space > 0 else cut[:max_chars]
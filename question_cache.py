@@ -0,0 +1,203 @@
+"""Content-addressed cache for generated question sets.
+
+Keys are a hash of everything that affects the output (cleaned notes, mode, difficulty,
+count, model and sampling options), so pasting the same notes twice skips the LLM run.
+Entries live in an in-memory LRU and, optionally, a SQLite file that survives restarts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def cache_key(**parts: Any) -> str:
+    """Hash the parts of a request that determine its questions."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """LRU cache with a TTL and limits on both entry count and total size."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, size, value = entry
+            if time.time() - stored_at > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: List[Dict[str, Any]], stored_at: Optional[float] = None):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (stored_at or time.time(), size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SQLiteCache:
+    """On-disk cache so question sets survive restarts."""
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS question_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[float, List[Dict[str, Any]]]]:
+        """Return (stored_at, questions) so the memory tier can keep the original age."""
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at FROM question_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if now - stored_at > self.ttl:
+                conn.execute("DELETE FROM question_cache WHERE key = ?", (key,))
+                self.expirations += 1
+                return None
+            conn.execute("UPDATE question_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return stored_at, json.loads(value)
+
+    def set(self, key: str, value: List[Dict[str, Any]]):
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO question_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            (total,) = conn.execute("SELECT COUNT(*) FROM question_cache").fetchone()
+            if total > self.max_entries:
+                removed = conn.execute(
+                    "DELETE FROM question_cache WHERE key IN "
+                    "(SELECT key FROM question_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (total - self.max_entries,)
+                ).rowcount
+                self.evictions += removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._connection().execute("SELECT COUNT(*) FROM question_cache").fetchone()
+        return {
+            'path': self.path,
+            'entries': entries,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        #sqlite connections must not cross a fork (e.g. gunicorn preloading the app), so each process opens its own
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+
+class QuestionCache:
+    """Memory cache in front of an optional SQLite cache, with hit/miss counters."""
+
+    def __init__(self, memory: MemoryCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                self.memory.set(key, value, stored_at=stored_at)
+                self._count('disk_hits')
+
+        self._count('hits' if value is not None else 'misses')
+        #hand out copies so callers can't change what's cached
+        return json.loads(json.dumps(value)) if value is not None else None
+
+    def set(self, key: str, value: List[Dict[str, Any]]):
+        value = json.loads(json.dumps(value))
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def record_bypass(self):
+        self._count('bypassed')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+            }
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['memory'] = self.memory.stats()
+        stats['disk'] = self.disk.stats() if self.disk is not None else None
+        return stats
+
+    def _count(self, key: str):
+        with self._lock:
+            setattr(self, key, getattr(self, key) + 1)
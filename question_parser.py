@@ -0,0 +1,248 @@
+"""Linear-time parsing of model output into question objects.
+
+The old parsers ran lazy `(.*?)` DOTALL regexes over whole blocks, which backtrack badly
+on long or malformed output (e.g. many A)-D) lines and no valid Answer: line). These
+helpers scan the text once for line-start markers (Question:, A)-D), Answer:, Key Terms:)
+and walk them with a small state machine, accepting exactly what those regexes accepted
+and producing the same dicts.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BLOCK_SEPARATOR = re.compile(r'\n?={3,}\n?')
+
+#markers are found with plain string searches; these regexes have no nested or lazy repetition
+_MC_MARKERS = re.compile(r'\n(?:([A-D])\)|Answer:)')
+_TRUE_FALSE = re.compile(r'\s*(true|false)', re.IGNORECASE)
+_KEY_TERMS = re.compile(r'\n(?:Key Terms:|Keywords:)')
+_SPACE = re.compile(r'\s*')
+
+
+def parse_question_block(block: str) -> Optional[Dict[str, Any]]:
+    """Parse a single ===-delimited block into a question object, or None if it doesn't match.
+
+    The block's header (e.g. "**Multiple Choice Question**") decides its type.
+    """
+    block = block.strip()
+    if not block:
+        return None
+
+    lowered = block.lower()
+
+    if 'multiple choice question' in lowered:
+        return _parse_multiple_choice(block)
+    elif 'true/false question' in lowered or 'true or false' in lowered:
+        return _parse_true_false(block)
+    elif 'fill-in-the-blank question' in lowered:
+        return _parse_fill_blank(block)
+    elif 'short answer question' in lowered:
+        return _parse_short_answer(block)
+    return None
+
+
+def parse_blocks(text: str, requested_count: int) -> List[Dict[str, Any]]:
+    """Split text on === lines and parse each block, stopping once requested_count questions are found."""
+    questions = []
+    for block in BLOCK_SEPARATOR.split(text):
+        question = parse_question_block(block)
+        if question:
+            questions.append(question)
+        if len(questions) >= requested_count:
+            break
+    return questions
+
+
+class QuestionStreamParser:
+    """Parse questions out of streamed model output as soon as each ===-delimited block is complete.
+
+    Uses the same block rules as parse_questions, so feeding the whole text in one go
+    gives the same result.
+    """
+    parser = 'text'  #which parser read the output, see question_schema.JsonQuestionStreamParser
+
+    def __init__(self, requested_count: int):
+        self.requested_count = requested_count
+        self.buffer = ''
+        self.parsed = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.parsed >= self.requested_count
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add a chunk of generated text and return any questions completed by it."""
+        self.buffer += chunk
+        questions = []
+
+        while not self.finished:
+            match = BLOCK_SEPARATOR.search(self.buffer)
+            # a separator at the very end of the buffer may still be growing (e.g. "===" + "=\n")
+            if not match or match.end() >= len(self.buffer):
+                break
+            block = self.buffer[:match.start()]
+            self.buffer = self.buffer[match.end():]
+            questions.extend(self._parse(block))
+
+        return questions
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Flush whatever is left in the buffer once the stream has ended."""
+        remaining = BLOCK_SEPARATOR.split(self.buffer)
+        self.buffer = ''
+        questions = []
+        for block in remaining:
+            if self.finished:
+                break
+            questions.extend(self._parse(block))
+        return questions
+
+    def _parse(self, block: str) -> List[Dict[str, Any]]:
+        question = parse_question_block(block)
+        if not question:
+            return []
+        self.parsed += 1
+        return [question]
+
+
+def split_qa_pairs(text: str) -> List[Tuple[str, str]]:
+    """Split text into (question, answer) pairs on "Question:" / "Answer:" markers (any case).
+
+    Same pairs as finditer(r"Question:(.*?)Answer:(.*?)(?=Question:|$)", DOTALL | IGNORECASE):
+    a question runs to the first Answer: after it, and an answer runs to the next Question:.
+    """
+    find = _case_insensitive_finder(text)
+    # `$` also matches just before a trailing newline
+    text_end = len(text) - 1 if text.endswith('\n') else len(text)
+
+    pairs = []
+    question = find('question:', 0)
+    while question != -1:
+        answer = find('answer:', question + len('question:'))
+        if answer == -1:
+            break
+        answer_start = answer + len('answer:')
+        question_next = find('question:', answer_start)
+        answer_end = question_next if question_next != -1 else max(answer_start, text_end)
+        pairs.append((text[question + len('question:'):answer], text[answer_start:answer_end]))
+        question = question_next
+    return pairs
+
+
+def split_options(text: str) -> Optional[Tuple[str, List[str]]]:
+    """Split "question A) .. B) .. C) .. D) .." (or "A." style) into the question and its four options.
+
+    Same result as searching r'(?:A[\\.\\)])(.*?)(?:B[\\.\\)])(.*?)(?:C[\\.\\)])(.*?)(?:D[\\.\\)])(.*)'
+    with DOTALL and removing the match, without the backtracking. Returns None if there aren't
+    four options in order.
+    """
+    starts = []
+    position = 0
+    for letter in 'ABCD':
+        start = _find_option_marker(text, letter, position)
+        if start == -1:
+            return None
+        starts.append(start)
+        position = start + 2
+
+    ends = starts[1:] + [len(text)]
+    options = [text[start + 2:end].strip() for start, end in zip(starts, ends)]
+    return text[:starts[0]].strip(), options
+
+
+def _find_option_marker(text: str, letter: str, position: int) -> int:
+    paren = text.find(letter + ')', position)
+    dot = text.find(letter + '.', position, paren if paren != -1 else len(text))
+    return dot if dot != -1 else paren
+
+
+def _parse_multiple_choice(block: str) -> Optional[Dict[str, Any]]:
+    start = block.find('Question:')
+    if start == -1:
+        return None
+
+    # boundaries of question, A, B, C, D; each marker only counts if it's the next one expected
+    bounds = [start + len('Question:')]
+    ends = []
+    for marker in _MC_MARKERS.finditer(block, bounds[0]):
+        letter = marker.group(1)
+        if letter:
+            if len(bounds) < 5 and letter == 'ABCD'[len(bounds) - 1]:
+                ends.append(marker.start())
+                bounds.append(marker.end())
+        elif len(bounds) == 5:
+            answer = _SPACE.match(block, marker.end()).end()
+            if answer < len(block) and block[answer] in 'ABCDabcd':
+                ends.append(marker.start())
+                q, a, b, c, d = [block[s:e].strip() for s, e in zip(bounds, ends)]
+                return {
+                    'type': 'multiple-choice',
+                    'question': q,
+                    'options': [a, b, c, d],
+                    'correctAnswerIndex': 'ABCD'.index(block[answer].upper())
+                }
+        # anything else (including an Answer: line we can't use) is just text in the current part
+    return None
+
+
+def _parse_true_false(block: str) -> Optional[Dict[str, Any]]:
+    find = _case_insensitive_finder(block)
+    start = find('question:', 0)
+    if start == -1:
+        return None
+    start += len('question:')
+
+    marker = find('\nanswer:', start)
+    while marker != -1:
+        answer = _TRUE_FALSE.match(block, marker + len('\nanswer:'))
+        if answer:
+            q = block[start:marker].strip()
+            return {
+                'type': 'true-false',
+                'question': q if q.lower().startswith("true or false") else f"True or False: {q}",
+                'correctAnswer': answer.group(1).lower() == 'true'
+            }
+        marker = find('\nanswer:', marker + 1)
+    return None
+
+
+def _parse_fill_blank(block: str) -> Optional[Dict[str, Any]]:
+    start = block.find('Question:')
+    if start == -1:
+        return None
+    marker = block.find('\nAnswer:', start + len('Question:'))
+    if marker == -1:
+        return None
+
+    q = block[start + len('Question:'):marker].strip()
+    return {
+        'type': 'fill-blank',
+        'question': q.replace('[BLANK]', '_____').replace('blank', '_____'),
+        'correctAnswer': block[marker + len('\nAnswer:'):].strip()
+    }
+
+
+def _parse_short_answer(block: str) -> Optional[Dict[str, Any]]:
+    start = block.find('Question:')
+    if start == -1:
+        return None
+    marker = _KEY_TERMS.search(block, start + len('Question:'))
+    if not marker:
+        return None
+
+    keywords = block[marker.end():]
+    return {
+        'type': 'short-answer',
+        'question': block[start + len('Question:'):marker.start()].strip(),
+        'keyTerms': [term.strip() for term in re.split(r',|;', keywords) if term.strip()]
+    }
+
+
+def _case_insensitive_finder(text: str) -> Callable[[str, int], int]:
+    """str.find that ignores case; plain find on lowered text when that keeps offsets the same."""
+    if text.isascii():
+        return text.lower().find
+
+    def find(marker: str, position: int) -> int:
+        match = re.compile(re.escape(marker), re.IGNORECASE).search(text, position)
+        return match.start() if match else -1
+    return find
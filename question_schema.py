@@ -0,0 +1,207 @@
+"""JSON output for question generation: the schema Ollama constrains the answer to, and its parser.
+
+With a JSON schema in the request's `format`, Ollama only samples tokens that keep the
+answer valid against it, so every question arrives with its fields in place instead of
+in a text layout that the regex parsers have to recognise. The answer is an object
+`{"questions": [...]}` with one object per question, already using the field names of
+the app's question dicts.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+from question_parser import parse_blocks
+
+QUESTION_SCHEMAS = {
+    'multiple-choice': {
+        "type": "object",
+        "properties": {
+            "type": {"enum": ["multiple-choice"]},
+            "question": {"type": "string"},
+            "options": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+            "correctAnswerIndex": {"enum": [0, 1, 2, 3]},
+        },
+        "required": ["type", "question", "options", "correctAnswerIndex"],
+    },
+    'true-false': {
+        "type": "object",
+        "properties": {
+            "type": {"enum": ["true-false"]},
+            "question": {"type": "string"},
+            "correctAnswer": {"type": "boolean"},
+        },
+        "required": ["type", "question", "correctAnswer"],
+    },
+    'fill-blank': {
+        "type": "object",
+        "properties": {
+            "type": {"enum": ["fill-blank"]},
+            "question": {"type": "string"},
+            "correctAnswer": {"type": "string"},
+        },
+        "required": ["type", "question", "correctAnswer"],
+    },
+    'short-answer': {
+        "type": "object",
+        "properties": {
+            "type": {"enum": ["short-answer"]},
+            "question": {"type": "string"},
+            "keyTerms": {"type": "array", "items": {"type": "string"}, "minItems": 3},
+        },
+        "required": ["type", "question", "keyTerms"],
+    },
+}
+
+
+def questions_schema(practice_mode: str, count: int) -> Dict[str, Any]:
+    """The `format` for a request of `count` questions: one type, or any of them for random mode."""
+    if practice_mode in QUESTION_SCHEMAS:
+        items = QUESTION_SCHEMAS[practice_mode]
+    else:
+        items = {"anyOf": list(QUESTION_SCHEMAS.values())}
+    return {
+        "type": "object",
+        "properties": {"questions": {"type": "array", "items": items, "minItems": count, "maxItems": count}},
+        "required": ["questions"],
+    }
+
+
+def question_from_json(item: Any, practice_mode: str) -> Optional[Dict[str, Any]]:
+    """The app's question dict for one decoded JSON question, or None if it's unusable.
+
+    Ollama versions that ignore the schema still tend to answer in its shape, so this
+    checks the fields rather than trusting them.
+    """
+    if not isinstance(item, dict):
+        return None
+    question_type = practice_mode if practice_mode in QUESTION_SCHEMAS else item.get('type')
+    question = item.get('question')
+    if not isinstance(question, str) or not question.strip():
+        return None
+    question = question.strip()
+
+    if question_type == 'multiple-choice':
+        options = item.get('options')
+        answer = item.get('correctAnswerIndex')
+        if isinstance(answer, str) and len(answer.strip()) == 1 and answer.strip().upper() in 'ABCD':
+            answer = 'ABCD'.index(answer.strip().upper())
+        if (not isinstance(options, list) or len(options) != 4
+                or not all(isinstance(option, str) and option.strip() for option in options)
+                or answer not in (0, 1, 2, 3) or isinstance(answer, bool)):
+            return None
+        return {
+            'type': 'multiple-choice',
+            'question': question,
+            'options': [option.strip() for option in options],
+            'correctAnswerIndex': answer
+        }
+
+    if question_type == 'true-false':
+        answer = item.get('correctAnswer')
+        if isinstance(answer, str) and answer.strip().lower() in ('true', 'false'):
+            answer = answer.strip().lower() == 'true'
+        if not isinstance(answer, bool):
+            return None
+        return {
+            'type': 'true-false',
+            'question': question if question.lower().startswith("true or false") else f"True or False: {question}",
+            'correctAnswer': answer
+        }
+
+    if question_type == 'fill-blank':
+        answer = item.get('correctAnswer')
+        if not isinstance(answer, str) or not answer.strip():
+            return None
+        return {
+            'type': 'fill-blank',
+            'question': question.replace('[BLANK]', '_____'),
+            'correctAnswer': answer.strip()
+        }
+
+    if question_type == 'short-answer':
+        key_terms = item.get('keyTerms')
+        if not isinstance(key_terms, list):
+            return None
+        key_terms = [term.strip() for term in key_terms if isinstance(term, str) and term.strip()]
+        if not key_terms:
+            return None
+        return {'type': 'short-answer', 'question': question, 'keyTerms': key_terms}
+
+    return None
+
+
+class JsonQuestionStreamParser:
+    """Parse questions out of a streamed JSON answer as soon as each question object is complete.
+
+    Same interface as question_parser.QuestionStreamParser. The text is scanned once,
+    tracking strings and brackets, and each object that is an element of the top-level
+    array (`{"questions": [...]}` or a bare `[...]`) is decoded on its own. If the answer
+    yields no questions at all (not JSON, or the model ignored the format) it's read with
+    the text parser instead, and `parser` becomes 'text'.
+    """
+
+    def __init__(self, requested_count: int, practice_mode: str):
+        self.requested_count = requested_count
+        self.practice_mode = practice_mode
+        self.buffer = ''
+        self.parsed = 0
+        self.parser = 'json'
+        self._position = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._item_start: Optional[int] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.parsed >= self.requested_count
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add a chunk of generated text and return any questions completed by it."""
+        self.buffer += chunk
+        questions = []
+        buffer = self.buffer
+        while self._position < len(buffer) and not self.finished:
+            char = buffer[self._position]
+            self._position += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if char == '{' and self._is_item_level():
+                    self._item_start = self._position - 1
+                self._stack.append(char)
+            elif char in '}]' and self._stack:
+                self._stack.pop()
+                if char == '}' and self._item_start is not None and self._is_item_level():
+                    questions.extend(self._parse(buffer[self._item_start:self._position]))
+                    self._item_start = None
+        return questions
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Once the stream has ended: the text parser's questions if the JSON gave none."""
+        if self.parsed or not self.buffer.strip():
+            return []
+        self.parser = 'text'
+        questions = parse_blocks(self.buffer, self.requested_count)
+        self.parsed += len(questions)
+        return questions
+
+    def _is_item_level(self) -> bool:
+        #directly inside the answer's array: [ alone, or { "questions": [
+        return self._stack in (['['], ['{', '['])
+
+    def _parse(self, text: str) -> List[Dict[str, Any]]:
+        try:
+            question = question_from_json(json.loads(text), self.practice_mode)
+        except ValueError:
+            return []
+        if not question:
+            return []
+        self.parsed += 1
+        return [question]
@@ -0,0 +1,85 @@
+"""Coalesce identical concurrent calls into one.
+
+When a whole class pastes the same notes at once, only the first request (the leader)
+goes to Ollama; the others wait for it and each get their own copy of the result.
+If the leader fails, every waiter gets the error and falls back on its own, and the
+key is released so the next request tries again.
+"""
+import copy
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class SharedCallError(Exception):
+    """Raised in a waiter when the call it was waiting on failed."""
+
+
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'coalesced': 0, 'shared_failures': 0}
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """Run fn once per key at a time. Returns (result, shared) where shared means we waited on another call."""
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call, timeout), True
+
+        try:
+            result = fn()
+        except BaseException as error:
+            self.finish(key, call, error=error)
+            raise
+        self.finish(key, call, result=result)
+        return result, False
+
+    def begin(self, key: str) -> Tuple[Call, bool]:
+        """Join the in-flight call for key, or start a new one. Returns (call, is_leader)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats['coalesced'] += 1
+                return call, False
+
+            call = Call()
+            self._calls[key] = call
+            self._stats['leaders'] += 1
+            return call, True
+
+    def finish(self, key: str, call: Call, result: Any = None, error: Optional[BaseException] = None):
+        """Publish the leader's outcome and release the key. Safe to call more than once."""
+        with self._lock:
+            if call.done.is_set():
+                return
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call.result = result
+            call.error = error
+            if error is not None and call.waiters:
+                self._stats['shared_failures'] += 1
+            call.done.set()
+
+    def wait(self, call: Call, timeout: Optional[float] = None) -> Any:
+        """Wait for the leader and return a private copy of its result."""
+        if not call.done.wait(timeout):
+            raise SharedCallError("Timed out waiting for an identical request already in progress")
+        if call.error is not None:
+            raise SharedCallError(f"Identical request already in progress failed: {call.error}") from call.error
+        return copy.deepcopy(call.result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+            stats['waiting'] = sum(call.waiters for call in self._calls.values())
+        return stats
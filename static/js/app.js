@@ -5,6 +5,7 @@ document.addEventListener('DOMContentLoaded', function () {
     const practiceMode = document.getElementById('practice-mode');
     const difficultyLevel = document.getElementById('difficulty-level');
     const questionCount = document.getElementById('question-count');
+    const freshQuestions = document.getElementById('fresh-questions');
     const startPracticeBtn = document.getElementById('start-practice-btn');
     const questionsContainer = document.getElementById('questions-container');
     const questionDisplay = document.getElementById('question-display');
@@ -19,9 +20,12 @@ document.addEventListener('DOMContentLoaded', function () {
  
 
     let notesContent = '';
+    let documentId = '';
     let currentQuestions = [];
     let userAnswers = [];
     let currentQuestionIndex = 0;
+    let expectedQuestionCount = 0;
+    let isGenerating = false;
 
     restoreSession();
 
@@ -50,21 +54,30 @@ document.addEventListener('DOMContentLoaded', function () {
         showUploadStatus('Processing your file...', '');
 
         try {
-            if (fileType === 'pdf') {
-                notesContent = await parsePdfFile(file);
-            } else if (fileType === 'docx') {
-                notesContent = await parseWordFile(file);
-            } else if (fileType === 'txt') {
-                notesContent = await parseTextFile(file);
-            } else {
+            if (!['pdf', 'docx', 'txt'].includes(fileType)) {
                 throw new Error('Unsupported file format. Please upload a PDF, Word, or Text file.');
             }
 
-            console.log('Parsed notes content:', notesContent.substring(0, 100) + '...');
+            //the server stores the file and extracts the text, so big PDFs don't freeze the tab
+            const formData = new FormData();
+            formData.append('file', file);
+            const response = await fetch('/api/documents', {
+                method: 'POST',
+                body: formData
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || `Server responded with status: ${response.status}`);
+            }
+
+            documentId = data.documentId;
+            notesContent = '';
+            console.log(`Uploaded document ${documentId} (${data.characters} characters)`);
             showUploadStatus('File uploaded and parsed successfully!', 'success');
             practiceMode.disabled = false;
 
-            saveToLocalStorage('notesContent', notesContent);
+            saveToLocalStorage('documentId', documentId);
+            localStorage.removeItem('notesContent');
         } catch (error) {
             console.error('Error processing file:', error);
             showUploadStatus(`Error: ${error.message}`, 'error');
@@ -112,28 +125,37 @@ document.addEventListener('DOMContentLoaded', function () {
         startPracticeBtn.disabled = true;
         startPracticeBtn.textContent = "Generating questions...";
 
+        currentQuestions = [];
+        userAnswers = [];
+        currentQuestionIndex = 0;
+        expectedQuestionCount = count;
+        isGenerating = true;
+
         try {
-            const response = await fetch('/api/generate-questions', {
+            const response = await fetch('/api/generate-questions/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
-                    notesContent: notesContent,
+                    ...(documentId ? { documentId: documentId } : { notesContent: notesContent }),
                     practiceMode: mode,
                     difficultyLevel: difficulty,
-                    count: count
+                    count: count,
+                    fresh: freshQuestions.checked
                 })
             });
 
+            if (response.status === 404 && documentId) {
+                throw new Error('Your uploaded notes are no longer on the server. Please upload the file again.');
+            }
             if (!response.ok) {
                 throw new Error(`Server responded with status: ${response.status}`);
             }
 
-            const data = await response.json();
-            currentQuestions = data.questions;
-            
-            if (!currentQuestions || currentQuestions.length === 0) {
+            await readQuestionStream(response, addStreamedQuestion);
+
+            if (currentQuestions.length === 0) {
                 throw new Error("Failed to generate questions. Please try again.");
             }
 
@@ -141,103 +163,68 @@ document.addEventListener('DOMContentLoaded', function () {
                 console.log('Random mode active with question types:', 
                     currentQuestions.map(q => q.type).join(', '));
             }
-
-            userAnswers = Array(currentQuestions.length).fill(null);
-            currentQuestionIndex = 0;
-
-            document.getElementById('practice-section').classList.add('hidden');
-            questionsContainer.classList.remove('hidden');
-            displayCurrentQuestion();
         } catch (error) {
             alert(`Failed to generate questions: ${error.message}`);
             console.error(error);
         } finally {
+            isGenerating = false;
+            expectedQuestionCount = currentQuestions.length;
+            if (currentQuestions.length > 0) {
+                updateQuestionProgress();
+            }
             startPracticeBtn.disabled = false;
             startPracticeBtn.textContent = "Start Practice";
         }
     }
 
+    //questions arrive one per line (NDJSON) so the first one can be shown before the rest are done
+    async function readQuestionStream(response, onQuestion) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
 
-    async function parsePdfFile(file) {
-        return new Promise((resolve, reject) => {
-            const fileReader = new FileReader();
-
-            fileReader.onload = async function(event) {
-                try {
-                    const typedArray = new Uint8Array(event.target.result);
-                    const loadingTask = pdfjsLib.getDocument({ data: typedArray });
-                    const pdf = await loadingTask.promise;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
 
-                    let fullText = '';
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
 
-                    for (let i = 1; i <= pdf.numPages; i++) {
-                        const page = await pdf.getPage(i);
-                        const textContent = await page.getTextContent();
-                        const pageText = textContent.items.map(item => item.str).join(' ');
-                        fullText += pageText + '\n';
-                    }
-
-                    resolve(fullText);
-                } catch (error) {
-                    reject(error);
-                }
-            };
-
-            fileReader.onerror = function() {
-                reject(new Error('Failed to read the PDF file.'));
-            };
-
-            fileReader.readAsArrayBuffer(file);
-        });
-    }
-
-    async function parseWordFile(file) {
-        return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-
-            reader.onload = function(event) {
-                mammoth.extractRawText({ arrayBuffer: event.target.result })
-                    .then(result => {
-                        resolve(result.value);
-                    })
-                    .catch(error => {
-                        reject(error);
-                    });
-            };
-
-            reader.onerror = function() {
-                reject(new Error('Failed to read the Word file.'));
-            };
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const message = JSON.parse(line);
+                if (message.question) onQuestion(message.question);
+            }
+        }
 
-            reader.readAsArrayBuffer(file);
-        });
+        if (buffer.trim()) {
+            const message = JSON.parse(buffer);
+            if (message.question) onQuestion(message.question);
+        }
     }
 
-    async function parseTextFile(file) {
-        return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-
-            reader.onload = function(event) {
-                resolve(event.target.result);
-            };
+    function addStreamedQuestion(question) {
+        currentQuestions.push(question);
+        userAnswers.push(null);
 
-            reader.onerror = function() {
-                reject(new Error('Failed to read the text file.'));
-            };
+        if (currentQuestions.length === 1) {
+            document.getElementById('practice-section').classList.add('hidden');
+            questionsContainer.classList.remove('hidden');
+        }
 
-            reader.readAsText(file);
-        });
+        //later questions only touch progress/nav so we don't wipe out an answer being typed
+        if (currentQuestions.length === 1) {
+            displayCurrentQuestion();
+        } else {
+            updateQuestionProgress();
+        }
     }
 
 
     function displayCurrentQuestion() {
         const question = currentQuestions[currentQuestionIndex];
-        questionProgress.textContent = `Question ${currentQuestionIndex + 1} of ${currentQuestions.length}`;
-
-        prevQuestionBtn.disabled = currentQuestionIndex === 0;
-        nextQuestionBtn.disabled = currentQuestionIndex === currentQuestions.length - 1;
-        nextQuestionBtn.classList.toggle('hidden', currentQuestionIndex === currentQuestions.length - 1);
-        finishPracticeBtn.classList.toggle('hidden', currentQuestionIndex !== currentQuestions.length - 1);
+        updateQuestionProgress();
 
         let html = '';
         switch (question.type) {
@@ -259,6 +246,19 @@ document.addEventListener('DOMContentLoaded', function () {
         setupQuestionInteractions(question.type);
     }
 
+    function updateQuestionProgress() {
+        const isLastLoaded = currentQuestionIndex === currentQuestions.length - 1;
+        const total = Math.max(expectedQuestionCount, currentQuestions.length);
+        questionProgress.textContent = `Question ${currentQuestionIndex + 1} of ${total}` +
+            (isGenerating ? ` (${currentQuestions.length} ready)` : '');
+
+        //while questions are still streaming in, the last loaded one isn't the last one
+        prevQuestionBtn.disabled = currentQuestionIndex === 0;
+        nextQuestionBtn.disabled = isLastLoaded;
+        nextQuestionBtn.classList.toggle('hidden', isLastLoaded && !isGenerating);
+        finishPracticeBtn.classList.toggle('hidden', !isLastLoaded || isGenerating);
+    }
+
     function createMultipleChoiceHTML(question) {
         const userAnswer = userAnswers[currentQuestionIndex];
         return `
@@ -623,11 +623,12 @@ document.addEventListener('DOMContentLoaded', function () {
         }
 
         notesContent = getFromLocalStorage('notesContent') || '';
+        documentId = getFromLocalStorage('documentId') || '';
         practiceMode.value = getFromLocalStorage('practiceMode') || '';
         difficultyLevel.value = getFromLocalStorage('difficultyLevel') || '';
         questionCount.value = getFromLocalStorage('questionCount') || '';
 
-        if (notesContent) {
+        if (notesContent || documentId) {
             practiceMode.disabled = false;
         }
         if (practiceMode.value) {
@@ -0,0 +1,79 @@
+"""Split long notes into prompt-sized chunks.
+
+Token counts are estimated (about 4 characters per token for English text with
+llama-style tokenizers), which is close enough for budgeting prompts.
+"""
+import math
+import re
+from typing import List, Tuple
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split text into chunks of at most max_tokens, breaking on paragraphs where possible.
+
+    Paragraphs that are too big on their own are broken on sentences, and sentences
+    that are still too big are cut at the character budget.
+    """
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            pieces.extend(_hard_split(sentence, max_tokens))
+
+    chunks = []
+    current = ''
+    for piece in pieces:
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def allocate_counts(chunks: List[str], count: int) -> List[Tuple[str, int]]:
+    """Share `count` questions between chunks in proportion to their size.
+
+    Every chunk that gets questions gets at least one; when there are more chunks than
+    questions, evenly spaced chunks are picked so the whole document is still covered.
+    """
+    if not chunks or count <= 0:
+        return []
+
+    if count <= len(chunks):
+        step = len(chunks) / count
+        return [(chunks[int(i * step)], 1) for i in range(count)]
+
+    #one each, then the rest by size using largest remainders
+    sizes = [estimate_tokens(chunk) for chunk in chunks]
+    total = sum(sizes)
+    extra = count - len(chunks)
+    exact = [extra * size / total for size in sizes]
+    shares = [1 + int(e) for e in exact]
+    leftover = count - sum(shares)
+    by_remainder = sorted(range(len(chunks)), key=lambda i: exact[i] - int(exact[i]), reverse=True)
+    for i in by_remainder[:leftover]:
+        shares[i] += 1
+
+    return list(zip(chunks, shares))
+
+
+def _hard_split(sentence: str, max_tokens: int) -> List[str]:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(sentence) <= max_chars:
+        return [sentence]
+    return [sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars)]
@@ -0,0 +1,195 @@
+"""Lightweight per-request tracing.
+
+Every request gets a trace id, and spans mark the steps inside it (retry attempts, the
+Ollama call, parsing, fallbacks) with their timing and attributes such as prompt length
+or parsed count. Finished spans go to an in-process ring buffer, readable at /api/traces,
+and optionally to a JSONL file. Span events (e.g. the raw model output) are bulky, so
+they are only kept for a sampled share of traces.
+
+The current span is a context variable, so nested spans pick up their parent without it
+being passed around. Worker threads don't inherit it: submit with
+contextvars.copy_context().run to keep their spans in the caller's trace.
+"""
+import contextvars
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 max_event_chars: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes)
+        self.events: List[Dict[str, Any]] = []
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._max_event_chars = max_event_chars
+        self.duration_ms: Optional[float] = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes: Any):
+        """Record something that happened during the span; dropped unless the trace is sampled."""
+        if not self.sampled:
+            return
+        for key, value in attributes.items():
+            if isinstance(value, str) and len(value) > self._max_event_chars:
+                attributes[key] = value[:self._max_event_chars] + f"... [{len(value) - self._max_event_chars} more chars]"
+        self.events.append({"name": name, "at_ms": self._elapsed_ms(), **attributes})
+
+    def finish(self):
+        self.duration_ms = self._elapsed_ms()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._started) * 1000, 3)
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off, so callers never need to check."""
+    trace_id = ''
+    span_id = ''
+    sampled = False
+
+    def set(self, **attributes: Any):
+        pass
+
+    def event(self, name: str, **attributes: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    """The innermost open span in this context (a no-op span outside any trace)."""
+    return _current_span.get() or NOOP_SPAN
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True, buffer_size: int = 2000, path: str = '',
+                 event_sample_rate: float = 0.1, max_event_chars: int = 2000):
+        self.enabled = enabled
+        self.path = path
+        self.event_sample_rate = event_sample_rate
+        self.max_event_chars = max_event_chars
+        self._spans = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        #own generator so sampling doesn't disturb seeded use of the random module
+        self._random = random.Random()
+        self._file = open(path, 'a', encoding='utf-8') if enabled and path else None
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+        """Time the block as a span, a child of the current span or else the root of a new trace.
+
+        An exception leaving the block marks the span as failed and is re-raised.
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent.sampled, self.max_event_chars, attributes)
+        else:
+            sampled = self._random.random() < self.event_sample_rate
+            span = Span(name, trace_id or new_trace_id(), None, sampled, self.max_event_chars, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            #a streaming caller stopped reading, that's not a failure
+            raise
+        except BaseException as error:
+            span.status = 'error'
+            span.error = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                #a generator finished in a different context than it started in
+                pass
+            span.finish()
+            self._export(span.to_dict())
+
+    def traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent finished traces first, one summary line each."""
+        with self._lock:
+            spans = list(self._spans)
+        span_counts = Counter(span["trace_id"] for span in spans)
+        summaries = []
+        for span in reversed(spans):
+            if span["parent_id"] is not None:
+                continue
+            summaries.append({
+                "trace_id": span["trace_id"],
+                "name": span["name"],
+                "start": span["start"],
+                "duration_ms": span["duration_ms"],
+                "status": span["status"],
+                "spans": span_counts[span["trace_id"]],
+                "attributes": span["attributes"],
+            })
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Every buffered span of one trace, in start order."""
+        with self._lock:
+            spans = [span for span in self._spans if span["trace_id"] == trace_id]
+        return sorted(spans, key=lambda span: span["start"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._spans)
+        return {
+            "enabled": self.enabled,
+            "buffered_spans": buffered,
+            "buffer_size": self._spans.maxlen,
+            "event_sample_rate": self.event_sample_rate,
+            "file": self.path or None,
+        }
+
+    def _export(self, span: Dict[str, Any]):
+        line = json.dumps(span, default=str) + "\n" if self._file else None
+        with self._lock:
+            self._spans.append(span)
+            if line:
+                self._file.write(line)
+                self._file.flush()